@@ -0,0 +1,196 @@
+import hashlib
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from flask import Blueprint, Response, request, stream_with_context
+from sqlalchemy import text
+
+from config.settings import Config
+from database.rate_cache import STATS_QUERY
+
+RATES_QUERY = """
+SELECT conversion_date, currency_code, conversion_rate::float8 AS conversion_rate
+FROM conversion_rates
+WHERE (CAST(:codes AS text[]) IS NULL OR currency_code = ANY(CAST(:codes AS text[])))
+AND conversion_date BETWEEN :start AND :end
+ORDER BY conversion_date, currency_code
+"""
+
+MIMETYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+SCHEMA = pa.schema([('date', pa.date32()), ('currency', pa.string()), ('rate', pa.float64())])
+
+# encodings flask-compress may append to the ETag it sends
+COMPRESSED_ETAG_SUFFIXES = ['', ':br', ':gzip', ':zstd', ':deflate']
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def parse_args(args):
+    """(codes or None for all, start date, end date, format) of a /rates request"""
+    codes = sorted({code.strip().upper() for code in args.get('codes', '').split(',') if code.strip()}) or None
+    try:
+        start = date.fromisoformat(args['from']) if args.get('from') else date(1999, 1, 1)
+        end = date.fromisoformat(args['to']) if args.get('to') else date.today()
+    except ValueError:
+        raise BadRequest("from and to must be dates as YYYY-MM-DD")
+    if start > end:
+        raise BadRequest("from must not be after to")
+    fmt = args.get('format') or request.accept_mimetypes.best_match(list(MIMETYPES.values()), 'application/json')
+    fmt = {mimetype: name for name, mimetype in MIMETYPES.items()}.get(fmt, fmt)
+    if fmt not in MIMETYPES:
+        raise BadRequest(f"format must be one of {', '.join(MIMETYPES)}")
+    return codes, start, end, fmt
+
+
+def matrix_batches(matrix, codes, start, end, batch_rows):
+    """Frames of at most about batch_rows rates, sliced from the cached matrix"""
+    codes = [code for code in (codes or matrix.codes) if matrix.has_currency(code)]
+    if not codes:
+        return
+    columns = [matrix.codes.index(code) for code in codes]
+    lo = np.searchsorted(matrix.dates, np.datetime64(start, 'D'), side='left')
+    hi = np.searchsorted(matrix.dates, np.datetime64(end, 'D'), side='right')
+    step = max(batch_rows // len(codes), 1)
+    for i in range(lo, hi, step):
+        values = matrix.values[i:min(i + step, hi)][:, columns]
+        valid = ~np.isnan(values)
+        yield pd.DataFrame({
+            'date': np.repeat(matrix.dates[i:i + len(values)], len(codes))[valid.ravel()],
+            'currency': np.tile(np.array(codes, dtype=object), len(values))[valid.ravel()],
+            'rate': values[valid]
+        })
+
+
+def query_batches(engine, codes, start, end, batch_rows):
+    """Frames of at most batch_rows rates, streamed from a server-side cursor"""
+    with engine.connect().execution_options(stream_results=True, yield_per=batch_rows) as connection:
+        result = connection.execute(text(RATES_QUERY), {'codes': codes, 'start': start, 'end': end})
+        for rows in result.partitions():
+            df = pd.DataFrame(rows, columns=['date', 'currency', 'rate'])
+            df['date'] = pd.to_datetime(df['date']).values.astype('datetime64[D]')
+            yield df
+
+
+def encode_json(batches):
+    """One JSON array of {date, currency, rate} objects, written a batch at a time"""
+    yield '['
+    first = True
+    for df in batches:
+        if df.empty:
+            continue
+        records = df.assign(date=np.datetime_as_string(df['date'].values.astype('datetime64[D]')))\
+            .to_json(orient='records')
+        yield records[1:-1] if first else ',' + records[1:-1]
+        first = False
+    yield ']'
+
+
+def encode_ndjson(batches):
+    """One JSON object per line"""
+    for df in batches:
+        if not df.empty:
+            yield df.assign(date=np.datetime_as_string(df['date'].values.astype('datetime64[D]')))\
+                .to_json(orient='records', lines=True)
+
+
+class ChunkSink:
+    """File-like target of the Arrow stream writer, handing out what was written since the last take()"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def encode_arrow(batches):
+    """An Arrow IPC stream: the schema, then one record batch per frame"""
+    sink = ChunkSink()
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), SCHEMA) as writer:
+        for df in batches:
+            writer.write_batch(pa.RecordBatch.from_pandas(df, schema=SCHEMA, preserve_index=False))
+            yield sink.take()
+    yield sink.take()
+
+
+ENCODERS = {'json': encode_json, 'ndjson': encode_ndjson, 'arrow': encode_arrow}
+
+
+def create_rates_blueprint(rate_cache, engine):
+    """Read-only rates API for other services, mounted on the dashboard's Flask server
+
+    GET /rates?codes=USD,GBP&from=2024-01-01&to=2024-12-31 returns the EUR
+    rates as JSON (default), NDJSON or an Arrow IPC stream (format=json,
+    ndjson or arrow, or the Accept header). Responses carry a strong ETag of
+    the data version and the query, and Cache-Control: a repeat with
+    If-None-Match gets a 304 without touching the rates. Rows are streamed
+    in batches of API_BATCH_ROWS, from the rate cache when it holds the
+    range and from a server-side cursor otherwise. Without a rate cache the
+    database's data version is counted at most every API_VERSION_TTL seconds.
+    """
+    blueprint = Blueprint('rates_api', __name__)
+    # (checked at, version) of the last count of the database's rows
+    last_count = [None, None]
+    count_lock = threading.Lock()
+
+    def data_version(matrix):
+        if matrix is not None:
+            return matrix.version
+        with count_lock:
+            checked_at, version = last_count
+            if checked_at is None or time.monotonic() - checked_at > Config.API_VERSION_TTL:
+                with engine.connect() as connection:
+                    stats = connection.execute(text(STATS_QUERY)).mappings().one()
+                version = f"{stats['latest_date']}:{stats['row_count']}"
+                last_count[:] = [time.monotonic(), version]
+            return version
+
+    @blueprint.route('/rates')
+    def rates():
+        try:
+            codes, start, end, fmt = parse_args(request.args)
+        except BadRequest as e:
+            return {'error': str(e)}, 400
+        # get() reloads a matrix invalidated by /cache/invalidate first
+        matrix = rate_cache.get() if rate_cache is not None else None
+        key = f"{data_version(matrix)}|{','.join(codes or ['*'])}|{start}|{end}|{fmt}"
+        etag = hashlib.sha256(key.encode()).hexdigest()[:32]
+        headers = {
+            'ETag': f'"{etag}"',
+            'Cache-Control': f'public, max-age={Config.API_CACHE_MAX_AGE}',
+            'Vary': 'Accept'
+        }
+        # flask-compress appends the encoding to the ETag it sends, so a
+        # client revalidates with e.g. "<etag>:br"
+        if any(request.if_none_match.contains(etag + suffix) for suffix in COMPRESSED_ETAG_SUFFIXES):
+            return Response(status=304, headers=headers)
+
+        if matrix is not None and matrix.covers(np.datetime64(start, 'D')):
+            batches = matrix_batches(matrix, codes, start, end, Config.API_BATCH_ROWS)
+        else:
+            batches = query_batches(engine, codes, start, end, Config.API_BATCH_ROWS)
+        return Response(stream_with_context(ENCODERS[fmt](batches)), mimetype=MIMETYPES[fmt], headers=headers)
+
+    return blueprint
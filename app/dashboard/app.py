@@ -1,11 +1,61 @@
+import hmac
+import threading
+import time
+
+# time the imports below when IMPORT_TIME_REPORT is enabled
+from monitoring.import_time import install_from_env
+import_timer = install_from_env()
+
 import dash
-from dash import dcc, html
+from dash import Input, Output, dcc, html
+from flask import request
 
 # Import our modular components
+from api.rates import create_rates_blueprint
 from config.settings import Config
-from database.db_manager import DatabaseManager
-from layouts.main_layout import create_main_layout
+from database.db_manager import get_db_manager
+from database.listener import RateListener
+from database.rate_cache import get_rate_cache
+from layouts.main_layout import LayoutCache, create_warming_layout
 from callbacks.chart_callbacks import register_chart_callbacks
+from monitoring.compression import enable_compression
+from monitoring.metrics import instrument_callbacks
+
+class Warmup:
+    """Database readiness, rate cache load and layout build
+
+    Run inline by create_app, or in FAST_STARTUP mode in a background thread
+    started per serving process with start() (after the fork under gunicorn,
+    as threads do not survive it), so the server answers right away. Until
+    it is done, pages get the warming layout and /readyz answers 503.
+    """
+
+    def __init__(self, db_manager, rate_cache, layout_cache):
+        self.db_manager = db_manager
+        self.rate_cache = rate_cache
+        self.layout_cache = layout_cache
+        self.done = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def run(self):
+        start = time.perf_counter()
+        # Wait for database to be ready
+        if not self.db_manager.wait_for_database():
+            print("Warning: Database connection failed, app may not work properly")
+        # Load the rate history once; callbacks slice it instead of querying
+        self.rate_cache.load(self.db_manager.get_engine())
+        self.layout_cache.get()
+        self.done.set()
+        print(f"Warm-up finished in {time.perf_counter() - start:.2f}s")
+
+    def start(self):
+        """Run the warm-up in a background thread, once per process"""
+        with self._lock:
+            if self._started or self.done.is_set():
+                return
+            self._started = True
+        threading.Thread(target=self.run, name='warmup', daemon=True).start()
 
 def create_app(config):
     """Create and configure the Dash application"""
@@ -21,22 +71,84 @@ def create_app(config):
         ]
     )
     
-    # Initialize database manager
-    db_manager = DatabaseManager()
-    
-    # Wait for database to be ready
-    if not db_manager.wait_for_database():
-        print("Warning: Database connection failed, app may not work properly")
-    
-    # Set the layout
-    app.layout = create_main_layout()
-    
-    # Register chart callbacks only
+    # Initialize the shared database manager
+    db_manager = get_db_manager()
     engine = db_manager.get_engine()
-    register_chart_callbacks(app, engine)
+    rate_cache = get_rate_cache()
+
+    # The layout is rebuilt per page load only when the data changed
+    layout_cache = LayoutCache(rate_cache)
+    warmup = Warmup(db_manager, rate_cache, layout_cache)
+    app.warmup = warmup
+    # started per serving process, see start_background_tasks
+    app.listener = RateListener(db_manager, rate_cache, layout_cache, ready=warmup.done)
+    if not config.FAST_STARTUP:
+        warmup.run()
+
+    def serve_layout():
+        return layout_cache.get() if warmup.done.is_set() else create_warming_layout()
+
+    app.layout = serve_layout
+
+    # Register chart callbacks only
+    register_chart_callbacks(app, engine, rate_cache)
+
+    # Reload the warming page once the dashboard is ready
+    app.clientside_callback(
+        """
+        function(n) {
+            fetch('/readyz').then(r => { if (r.ok) { window.location.reload(); } });
+            return window.dash_clientside.no_update;
+        }
+        """,
+        Output('warmup-interval', 'disabled'),
+        Input('warmup-interval', 'n_intervals')
+    )
+
+    # Read-only rates API for other services
+    app.server.register_blueprint(create_rates_blueprint(rate_cache, engine))
+
+    # Time every callback and expose the timings on /metrics
+    instrument_callbacks(app)
+
+    if config.COMPRESS_RESPONSES:
+        enable_compression(app.server)
+
+    @app.server.route('/cache/invalidate', methods=['POST'])
+    def invalidate_cache():
+        """Reload the rate cache, called by the upload job after inserting rows"""
+        token = request.headers.get('X-Cache-Token', '')
+        if not config.CACHE_INVALIDATE_TOKEN or not hmac.compare_digest(token, config.CACHE_INVALIDATE_TOKEN):
+            return 'Forbidden', 403
+        rate_cache.invalidate()
+        return 'OK'
+
+    @app.server.route('/healthz')
+    def healthz():
+        """Liveness probe: the process is serving requests"""
+        return 'OK'
+
+    @app.server.route('/readyz')
+    def readyz():
+        """Readiness probe, reusing the last database check for HEALTH_CHECK_TTL seconds"""
+        if not warmup.done.is_set():
+            return {'state': 'warming'}, 503
+        matrix = rate_cache.peek()
+        status = {
+            'state': 'ready',
+            'database': db_manager.is_healthy(),
+            'rate_cache_version': matrix.version if matrix is not None else None
+        }
+        return status, 200 if status['database'] or matrix is not None else 503
     
     return app
 
+def start_background_tasks(app, config):
+    """Start the per-process threads: the deferred warm-up and the rate update listener"""
+    app.warmup.start()
+    if config.LISTEN_FOR_UPDATES:
+        app.listener.start()
+
 def main():
     """Main entry point for the application"""
 
@@ -44,6 +156,9 @@ def main():
     config = Config()
 
     app = create_app(config)
+    start_background_tasks(app, config)
+    if import_timer is not None:
+        import_timer.report()
     
     # Run the app
     app.run(
@@ -0,0 +1,101 @@
+// Clientside chart callbacks, used when CLIENTSIDE_CHART is enabled.
+// The server sends the selected currencies' full history once (see
+// processing/chart_data.py); date range changes are handled here without a
+// server round trip.
+
+const DAY_MS = 86400000;
+// same as DEFAULT_DAYS in callbacks/chart_callbacks.py
+const DEFAULT_DAYS = 30;
+
+function decodeInt32(encoded) {
+    const bytes = Uint8Array.from(atob(encoded), c => c.charCodeAt(0));
+    return new Int32Array(bytes.buffer);
+}
+
+// first index of a sorted array with a value >= target
+function lowerBound(values, target) {
+    let lo = 0, hi = values.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (values[mid] < target) lo = mid + 1; else hi = mid;
+    }
+    return lo;
+}
+
+// indices of the min and max point per bucket, as min_max_indices on the server
+function minMaxIndices(y, maxPoints) {
+    const n = y.length;
+    if (n <= maxPoints) return y.map((_, i) => i);
+    const size = Math.ceil(n / Math.max(1, Math.floor(maxPoints / 2)));
+    const keep = new Set([0, n - 1]);
+    for (let start = 0; start < n; start += size) {
+        let lo = start, hi = start;
+        for (let i = start; i < Math.min(start + size, n); i++) {
+            if (y[i] < y[lo]) lo = i;
+            if (y[i] > y[hi]) hi = i;
+        }
+        keep.add(lo);
+        keep.add(hi);
+    }
+    return Array.from(keep).sort((a, b) => a - b);
+}
+
+function isoDate(day) {
+    return new Date(day * DAY_MS).toISOString().slice(0, 10);
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    chart: {
+        // Update date range filter depending on which button is clicked
+        updateDateRange: function () {
+            const triggered = dash_clientside.callback_context.triggered;
+            const propId = triggered.length ? triggered[0].prop_id : '';
+            // e.g. 'btn-30.n_clicks' -> 30
+            const days = propId.startsWith('btn-') ? parseInt(propId.split('.')[0].split('-')[1], 10) : DEFAULT_DAYS;
+            return [days, days];
+        },
+
+        // Update button styles depending on which button is clicked
+        updateButtonStyles: function (selectedValue) {
+            return dash_clientside.callback_context.outputs_list.map(
+                output => output.id === `btn-${selectedValue}` ? 'btn btn-primary' : 'btn btn-light'
+            );
+        },
+
+        // Draw the stored series from the start of the selected date range
+        renderChart: function (data, days) {
+            if (!data) return dash_clientside.no_update;
+            if (data.error) return {data: [], layout: {title: {text: data.error}}};
+            const dates = decodeInt32(data.dates);
+            const startDay = Math.floor(Date.now() / DAY_MS) - (days || DEFAULT_DAYS);
+            const lo = lowerBound(dates, startDay);
+            const traces = [];
+            data.codes.forEach(code => {
+                const rates = decodeInt32(data.series[code]);
+                const scale = data.scales[code];
+                const x = [], y = [];
+                for (let i = lo; i < dates.length; i++) {
+                    if (rates[i] !== data.missing) {
+                        x.push(dates[i]);
+                        y.push(rates[i] / scale);
+                    }
+                }
+                if (!y.length) return;
+                const keep = minMaxIndices(y, data.max_points);
+                traces.push({
+                    type: 'scatter',
+                    mode: 'lines',
+                    name: code,
+                    legendgroup: code,
+                    x: keep.map(i => isoDate(x[i])),
+                    y: keep.map(i => y[i]),
+                    hovertemplate: `currency_code=${code}<br>conversion_rate=%{y}<extra></extra>`
+                });
+            });
+            if (!traces.length) {
+                return {data: [], layout: {title: {text: 'No data available for selected criteria'}}};
+            }
+            return {data: traces, layout: data.layout};
+        }
+    }
+});
@@ -1,73 +1,292 @@
-from datetime import timedelta
+import numpy as np
 from config.settings import Config
-from dash import Input, Output, ctx, html
-import plotly.express as px
+from callbacks.output_cache import create_output_cache
+from dash import ClientsideFunction, Input, Output, State, ctx, html, no_update
+import plotly.graph_objects as go
 import pandas as pd
+from database.rate_cache import BASE_CURRENCY, CrossRateCache, RateMatrix, days_ago
+from layouts.main_layout import quote_options
+from monitoring.metrics import count_error, phase
+from processing.analytics import AnalyticsCache
+from processing.chart_data import encode_chart_data
+from processing.downsample import downsample_frame
 from sqlalchemy import text
 
-def register_chart_callbacks(app, engine):
-    """Register all chart-related callbacks"""
+CHART_QUERY = """
+SELECT conversion_date, currency_code, conversion_rate::float8 AS conversion_rate
+FROM conversion_rates
+WHERE currency_code = ANY(:codes)
+AND conversion_date >= CURRENT_DATE - CAST(:days AS integer)
+ORDER BY conversion_date
+"""
 
-    # Find the default days value (30 days)
-    DEFAULT_DAYS = 30
+# Low and high rate per period from the rollups the upload job maintains, the
+# low first when the period closed at or above its open (see RateMatrix.rollup)
+ROLLUP_CHART_QUERY = """
+SELECT r.period_start AS conversion_date, r.currency_code, p.conversion_rate
+FROM conversion_rate_rollups r
+CROSS JOIN LATERAL (VALUES
+    (1, CASE WHEN r.close_rate >= r.open_rate THEN r.low_rate ELSE r.high_rate END),
+    (2, CASE WHEN r.close_rate >= r.open_rate THEN r.high_rate ELSE r.low_rate END)
+) AS p(point, conversion_rate)
+WHERE r.resolution = :resolution
+AND r.currency_code = ANY(:codes)
+AND r.period_start >= CURRENT_DATE - CAST(:days AS integer)
+ORDER BY r.period_start, p.point
+"""
 
-    """Update date range filter depending on which button is clicked"""
-    @app.callback(
-        [Output('date-range-filter', 'data'),
-         Output('current-selection', 'data')],
-        [Input(f'btn-{days}', 'n_clicks') for days, _ in Config.DATE_RANGE_OPTIONS]
-    )
-    def update_date_range(*n_clicks):
-        if ctx.triggered_id is not None:
-            # Extract the days value from the button ID (e.g., 'btn-30' -> 30)
-            days = int(ctx.triggered_id.split('-')[1])
-            return days, days
-        return DEFAULT_DAYS, DEFAULT_DAYS
+# Rollup resolutions, coarsest first, with their approximate length in days
+ROLLUP_PERIOD_DAYS = [('month', 30), ('week', 7)]
 
-    """Update button styles depending on which button is clicked"""
-    @app.callback(
-        [Output(f'btn-{days}', 'className') for days, _ in Config.DATE_RANGE_OPTIONS],
-        Input('current-selection', 'data')
+# px.line switches to WebGL traces above this many points
+WEBGL_MIN_POINTS = 1000
+
+# Style of a single score box in a scorecard
+SCORE_BOX_STYLE = {
+    'display': 'inline-block',
+    'width': '100px',
+    'text-align': 'center',
+    'border': '0px solid black',
+    'padding': '10px',
+    'margin': '10px',
+    'border-radius': '8px',
+    'background': '#f8f9fa'
+}
+
+# Analytics shown per currency: (summary key, label, format)
+HISTORY_STATS = [
+    ('percentile', 'Pctl', '{:.0f}%'),
+    ('z_score', 'Z 1Y', '{:+.2f}'),
+    ('volatility', 'Vol 1Y', '{:.1%}'),
+    ('max_drawdown', 'DD 1Y', '{:.1%}')
+]
+
+# Running sums at each offset (in days) before every currency's latest date
+SCORECARD_QUERY = """
+SELECT c.currency_code, o.offset_days, s.rate_sum, s.rate_count
+FROM currencies c
+CROSS JOIN LATERAL (
+    SELECT conversion_date AS latest_date
+    FROM conversion_rate_sums
+    WHERE currency_id = c.currency_id
+    ORDER BY conversion_date DESC
+    LIMIT 1
+) l
+CROSS JOIN unnest(CAST(:offsets AS integer[])) AS o(offset_days)
+LEFT JOIN LATERAL (
+    SELECT rate_sum, rate_count
+    FROM conversion_rate_sums
+    WHERE currency_id = c.currency_id
+      AND conversion_date <= l.latest_date - o.offset_days
+    ORDER BY conversion_date DESC
+    LIMIT 1
+) s ON TRUE
+WHERE c.currency_code = ANY(CAST(:codes AS text[]))
+"""
+
+def chart_resolution(days):
+    """Coarsest rollup resolution that still gives a range CHART_MIN_POINTS points
+
+    None means daily rates. 'All Time' gets monthly lows and highs and
+    '5 Years' weekly ones; shorter ranges stay daily.
+    """
+    for resolution, period_days in ROLLUP_PERIOD_DAYS:
+        if resolution in Config.ROLLUP_RESOLUTIONS and days // period_days >= Config.CHART_MIN_POINTS:
+            return resolution
+    return None
+
+def build_chart_figure(df, base=BASE_CURRENCY):
+    """Build the line chart of the (downsampled) rates
+
+    Traces get numpy arrays, which plotly serializes as base64 typed arrays:
+    dates as milliseconds since the epoch on a date axis and rates as
+    float64, instead of JSON lists of ISO date strings and decimals. Dates
+    go as float64 (exact for milliseconds) since plotly.js has no int64
+    typed arrays and plotly would fall back to a JSON list.
+    """
+    fig = go.Figure()
+    # WebGL for long series, as px.line does
+    trace_type = go.Scattergl if len(df) > WEBGL_MIN_POINTS else go.Scatter
+    for code, df_currency in df.groupby('currency_code', sort=False, observed=True):
+        fig.add_trace(trace_type(
+            x=pd.to_datetime(df_currency['conversion_date']).to_numpy('datetime64[ms]').astype(np.int64).astype(np.float64),
+            y=df_currency['conversion_rate'].to_numpy(dtype=np.float64),
+            mode='lines',
+            name=code,
+            legendgroup=code,
+            hovertemplate=f'currency_code={code}<br>conversion_date=%{{x|%Y-%m-%d}}<br>'
+                          'conversion_rate=%{y}<extra></extra>'
+        ))
+    fig.update_xaxes(type='date')
+    return style_chart_figure(fig, base)
+
+def empty_figure(title=None):
+    """Figure without data, laid out as plotly.express does
+
+    plotly.express is imported on first use, keeping it off the startup path.
+    """
+    import plotly.express as px
+    return px.line(title=title)
+
+def style_chart_figure(fig, base=BASE_CURRENCY):
+    """Apply the chart title, tooltip, axis and legend styling"""
+    # Add a title to the chart
+    if base == BASE_CURRENCY:
+        fig.update_layout(title=f"Conversion Rate from Eur to Selected Currencies (Higher value = stronger Euro)")
+    else:
+        fig.update_layout(title=f"Conversion Rate from {base} to Selected Currencies (Higher value = stronger {base})")
+    # Add an info icon popover to the title
+    fig.update_layout(
+        title_x=0.5,
+        title_y=0.95,
+        title_font_size=20,
+        title_font_color='#2c3e50',
+        title_font_family='Lato, "Helvetica Neue", Arial, Helvetica, sans-serif'
     )
-    def update_button_styles(selected_value):
-        button_classes = []
-        for days, _ in Config.DATE_RANGE_OPTIONS:
-            if days == selected_value:
-                button_classes.append('btn btn-primary')
-            else:
-                button_classes.append('btn btn-light')
-        return button_classes
+    # Add a tooltip to the chart
+    fig.update_layout(
+        hovermode='x unified',
+        hoverlabel=dict(bgcolor='white', font_size=12, font_family='Lato, "Helvetica Neue", Arial, Helvetica, sans-serif'),
+        hoverlabel_bgcolor='white',
+        hoverlabel_font_size=12,
+        hoverlabel_font_family='Lato, "Helvetica Neue", Arial, Helvetica, sans-serif'
+    )
+    
+    # Update the axis labels
+    fig.update_xaxes(title_text='Date')
+    fig.update_yaxes(title_text='Conversion Rate')
+    
+    # Update the legend
+    fig.update_layout(legend_title_text='Currency')
+
+    return fig
+
+def register_chart_callbacks(app, engine, rate_cache=None, clientside=None, output_cache=None):
+    """Register all chart-related callbacks
+
+    Callbacks read from the shared rate cache when it holds the requested
+    history and only fall back to querying the database otherwise. Rates
+    from a base currency other than EUR are cross rates, divided out of the
+    EUR rates of the same dates (see RateMatrix.rebase). In
+    clientside mode (CLIENTSIDE_CHART) the chart and date range buttons are
+    driven by the browser, see register_clientside_chart. Outputs are
+    memoized per inputs and data version in the output cache (OUTPUT_CACHE);
+    they are computed for the sorted currencies, so every order of the same
+    selection shares one entry.
+    """
+    if clientside is None:
+        clientside = Config.CLIENTSIDE_CHART
+    if output_cache is None:
+        output_cache = create_output_cache(rate_cache)
+    cross_rates = CrossRateCache(rate_cache) if rate_cache is not None else None
+    analytics = AnalyticsCache()
+
+    def get_matrix(start_date, base=BASE_CURRENCY):
+        """Get the cached rates from base if they cover history since start_date"""
+        matrix = cross_rates.get(base) if cross_rates is not None else None
+        if matrix is not None and matrix.covers(start_date):
+            return matrix
+        return None
+
+    def query_matrix(selected_currencies, days, base):
+        """Rates from base over the last `days` days, computed from a SQL read"""
+        df = pd.read_sql(text(CHART_QUERY), engine, params={
+            'codes': sorted(set(selected_currencies) | {base}), 'days': days})
+        if df.empty or base not in set(df['currency_code']):
+            return None
+        return RateMatrix.from_frame(df).rebase(base)
+
+    def get_period_averages(selected_currencies, periods, base=BASE_CURRENCY):
+        """Get the (latest, prior) period average rate per currency and period
+
+        The latest period covers [latest - period, latest] and the prior period
+        [latest - 2 * period, latest - period]. Both are answered from running
+        sums, so the cost does not grow with the amount of stored history.
+        """
+        averages = {}
+        matrix = get_matrix(days_ago(max(periods) * 2 + 1), base)
+        if matrix is None and base != BASE_CURRENCY:
+            # the running sums table only holds EUR rates; allow for the
+            # latest date lagging today
+            matrix = query_matrix(selected_currencies, max(periods) * 2 + 31, base)
+            if matrix is None:
+                return averages
+        if matrix is not None:
+            for currency in selected_currencies:
+                if not matrix.has_currency(currency) or matrix.latest_date(currency) is None:
+                    continue
+                latest = matrix.latest_date(currency)
+                averages[currency] = {}
+                for period in periods:
+                    delta = np.timedelta64(period, 'D')
+                    averages[currency][period] = (
+                        matrix.window_mean(currency, latest - delta, latest),
+                        matrix.window_mean(currency, latest - delta * 2, latest - delta)
+                    )
+            return averages
+
+        # running sums at the window boundaries, relative to the latest date
+        offsets = sorted({o for p in periods for o in (0, p, p + 1, p * 2 + 1)})
+        df = pd.read_sql(text(SCORECARD_QUERY), engine,
+                         params={'codes': list(selected_currencies), 'offsets': offsets})
+        for currency, df_currency in df.groupby('currency_code'):
+            # no running sum before a boundary means no history before it
+            sums = {row.offset_days: (row.rate_sum, row.rate_count)
+                    for row in df_currency.fillna(0).itertuples()}
+
+            def window_mean(newer, older):
+                count = sums[newer][1] - sums[older][1]
+                return (sums[newer][0] - sums[older][0]) / count if count else None
+
+            averages[currency] = {
+                period: (window_mean(0, period + 1), window_mean(period, period * 2 + 1))
+                for period in periods
+            }
+        return averages
+
+    def get_summary(base):
+        """Analytics of every currency from base, None without the full history cached"""
+        matrix = cross_rates.get(base) if cross_rates is not None else None
+        if matrix is None or not matrix.complete:
+            return None
+        return analytics.get(matrix)
 
     """Populate the scorecards given selected currencies"""
     @app.callback(
         Output('scorecards-container', 'children'),
-        Input('currency-dropdown', 'value')
+        Input('currency-dropdown', 'value'),
+        Input('base-dropdown', 'value')
     )
-    def update_scorecards(selected_currencies):
+    def update_scorecards(selected_currencies, base):
         """Update the scorecards given selected currencies"""
-        # time period to generate scorecards for
-        time_periods = [(7, 'WoW'), (30, 'MoM'), (365, 'YoY')]
-        cards = []
-
-        query_curr_string = ','.join([f"'{currency}'" for currency in selected_currencies])
-        query = f"""
-        SELECT conversion_date, currency_code, conversion_rate 
-        FROM conversion_rates 
-        WHERE currency_code in ({query_curr_string})
-        ORDER BY conversion_date
-        """
-
+        base = base or BASE_CURRENCY
+        currencies = tuple(sorted(selected_currencies or []))
         try:
-            df = pd.read_sql(query, engine)
+            cards = output_cache.get('update_scorecards', (currencies, base),
+                                     lambda: build_scorecards(currencies, base))
+            # one card per currency, shown in the order they were selected
+            return [cards[currencies.index(currency)] for currency in selected_currencies or []]
         except Exception as e:
             print(f"Error updating scorecards: {e}")
+            count_error('update_scorecards')
             return html.Div([html.H4("Error loading scorecards")])
 
+    def build_scorecards(selected_currencies, base):
+        """Build a scorecard per selected currency"""
+        # time period to generate scorecards for
+        time_periods = [(7, 'WoW'), (30, 'MoM'), (365, 'YoY')]
+        cards = []
+
+        with phase('query'):
+            averages = get_period_averages(selected_currencies, [period for period, _ in time_periods], base)
+        with phase('transform'):
+            summary = get_summary(base) or {}
+
         for currency in selected_currencies:
 
             # Enclose each card (currency and its scorecards) in an outline box with rounded corners
             card_children = [
-                html.H3(f"{currency}", 
+                html.H3(f"{currency}" if base == BASE_CURRENCY else f"{base}/{currency}", 
                     style={
                         'display': 'inline-block',
                         'vertical-align': 'center',
@@ -79,19 +298,12 @@ def register_chart_callbacks(app, engine):
                     })
             ]
 
-            df_currency = df[df['currency_code'] == currency]
-
-            latest_date = df_currency['conversion_date'].max()
             for period, period_name in time_periods:
-                latest_period = df_currency[df_currency['conversion_date'] >= latest_date - timedelta(days=period)]
-                prior_period = df_currency[df_currency['conversion_date'].between(latest_date - timedelta(days=period * 2), latest_date - timedelta(days=period))]
+                latest_period_avg, prior_period_avg = averages.get(currency, {}).get(period, (None, None))
 
-                if latest_period.empty or prior_period.empty:
+                if latest_period_avg is None or prior_period_avg is None:
                     continue
 
-                latest_period_avg = latest_period['conversion_rate'].mean()
-                prior_period_avg = prior_period['conversion_rate'].mean()
-
                 score = (latest_period_avg - prior_period_avg) / prior_period_avg * 100
                 if score > 0:
                     score_color = 'green'
@@ -107,17 +319,17 @@ def register_chart_callbacks(app, engine):
                     html.Div([
                         html.H5(f"{period_name}"),
                         html.H5(f"{score_text}{abs(score):.2f}%", style={'color': score_color})
-                    ], style={
-                        'display': 'inline-block',
-                        'width': '100px',
-                        'text-align': 'center',
-                        'border': '0px solid black',
-                        'padding': '10px',
-                        'margin': '10px',
-                        'border-radius': '8px',
-                        'background': '#f8f9fa'
-                    })
+                    ], style=SCORE_BOX_STYLE)
                 )
+
+            # How the latest rate compares to the history
+            stats = summary.get(currency, {})
+            history_boxes = [
+                html.Div([html.H5(name), html.H5(fmt.format(stats[key]))], style=SCORE_BOX_STYLE)
+                for key, name, fmt in HISTORY_STATS if stats.get(key) is not None
+            ]
+            if history_boxes:
+                card_children.append(html.Div(history_boxes))
             # Wrap the card_children in a shadow box with rounded corners
             cards.append(
                 html.Div(
@@ -135,65 +347,180 @@ def register_chart_callbacks(app, engine):
             )
         return cards
 
+    def get_chart_frame(selected_currencies, days, base=BASE_CURRENCY, resolution=None):
+        """Get the rates from base to the selected currencies for the last `days` days
+
+        With a resolution ('week' or 'month') the rates are the low and high
+        of every period, read from the rollup table instead of the daily rows.
+        """
+        matrix = get_matrix(days_ago(days), base)
+        if matrix is not None:
+            if resolution is not None:
+                return matrix.rollup(selected_currencies, days_ago(days), resolution)
+            return matrix.to_long(selected_currencies, days_ago(days))
+        if base != BASE_CURRENCY:
+            # the rollups hold EUR rates; extremes of cross rates come from daily ones
+            matrix = query_matrix(selected_currencies, days, base)
+            if matrix is None:
+                return pd.DataFrame(columns=['conversion_date', 'currency_code', 'conversion_rate'])
+            if resolution is not None:
+                return matrix.rollup(selected_currencies, days_ago(days), resolution)
+            return matrix.to_long(selected_currencies)
+        if resolution is not None:
+            return pd.read_sql(text(ROLLUP_CHART_QUERY), engine, params={
+                'codes': list(selected_currencies), 'days': days, 'resolution': resolution})
+        return pd.read_sql(text(CHART_QUERY), engine, params={
+            'codes': list(selected_currencies), 'days': days})
+
+    # Find the default days value (30 days)
+    DEFAULT_DAYS = 30
+
+    """Offer every currency but the base as a quote currency"""
+    @app.callback(
+        Output('currency-dropdown', 'options'),
+        Output('currency-dropdown', 'value'),
+        Input('base-dropdown', 'value'),
+        State('base-dropdown', 'options'),
+        State('currency-dropdown', 'value'),
+        prevent_initial_call=True
+    )
+    def update_quote_options(base, base_options, selected_currencies):
+        base = base or BASE_CURRENCY
+        selected_currencies = selected_currencies or []
+        value = [code for code in selected_currencies if code != base]
+        return (quote_options(base_options, base),
+                value if len(value) < len(selected_currencies) else no_update)
+
+    if clientside:
+        register_clientside_chart(app, get_chart_frame, output_cache)
+        return
+
+    """Update date range filter depending on which button is clicked"""
+    @app.callback(
+        [Output('date-range-filter', 'data'),
+         Output('current-selection', 'data')],
+        [Input(f'btn-{days}', 'n_clicks') for days, _ in Config.DATE_RANGE_OPTIONS]
+    )
+    def update_date_range(*n_clicks):
+        if ctx.triggered_id is not None:
+            # Extract the days value from the button ID (e.g., 'btn-30' -> 30)
+            days = int(ctx.triggered_id.split('-')[1])
+            return days, days
+        return DEFAULT_DAYS, DEFAULT_DAYS
+
+    """Update button styles depending on which button is clicked"""
+    @app.callback(
+        [Output(f'btn-{days}', 'className') for days, _ in Config.DATE_RANGE_OPTIONS],
+        Input('current-selection', 'data')
+    )
+    def update_button_styles(selected_value):
+        button_classes = []
+        for days, _ in Config.DATE_RANGE_OPTIONS:
+            if days == selected_value:
+                button_classes.append('btn btn-primary')
+            else:
+                button_classes.append('btn btn-light')
+        return button_classes
 
     """Populate the timeseries chart given selected currencies and date range"""
     @app.callback(
         Output('chart', 'figure'),
         Input('currency-dropdown', 'value'),
-        Input('date-range-filter', 'data')
+        Input('date-range-filter', 'data'),
+        Input('base-dropdown', 'value')
     )
-    def update_chart(selected_currencies, selected_date_range):
-        """Update the chart based on selected currencies and date range"""
+    def update_chart(selected_currencies, selected_date_range, base):
+        """Update the chart based on selected currencies, date range and base currency"""
+        selected_date_range = int(selected_date_range or DEFAULT_DAYS)
+        base = base or BASE_CURRENCY
+        currencies = tuple(sorted(selected_currencies or []))
         
-        # Handle date range
-        date_filter = f">= CURRENT_DATE - INTERVAL '{selected_date_range} days'"
+        try:
+            return output_cache.get('update_chart', (currencies, selected_date_range, base),
+                                    lambda: build_chart(currencies, selected_date_range, base))
+        except Exception as e:
+            print(f"Error updating chart: {e}")
+            count_error('update_chart')
+            return empty_figure('Error loading chart data')
+
+    def build_chart(selected_currencies, selected_date_range, base):
+        """Build the chart of the selected currencies over the date range"""
+        with phase('query'):
+            df = get_chart_frame(list(selected_currencies), selected_date_range, base,
+                                 chart_resolution(selected_date_range))
         
-        # Handle multiple selections
-        currencies = "', '".join(selected_currencies)
-        query = f"""
-        SELECT conversion_date, currency_code, conversion_rate 
-        FROM conversion_rates 
-        WHERE currency_code IN ('{currencies}')
-        AND conversion_date {date_filter}
-        ORDER BY conversion_date
-        """
+        if df.empty:
+            return empty_figure('No data available for selected criteria')
+
+        # Reduce long ranges to what the chart can display
+        with phase('transform'):
+            df = downsample_frame(df, Config.CHART_WIDTH_PX * 2, Config.DOWNSAMPLE_METHOD)
+        
+        with phase('figure'):
+            fig = build_chart_figure(df, base)
         
+        return fig
+
+
+def register_clientside_chart(app, get_chart_frame, output_cache):
+    """Register the chart callbacks of the clientside mode
+
+    The server sends the full history of the selected currencies to the
+    chart-data store once per currency selection, compactly encoded. Date
+    range clicks, button styles and the chart itself are then handled by
+    the clientside callbacks in assets/chart.js, so pure range changes
+    never reach the server.
+    """
+    all_time = max(days for days, _ in Config.DATE_RANGE_OPTIONS)
+    # the browser draws the traces into the server's figure layout, built
+    # on first use per base currency
+    layouts = {}
+
+    def get_layout(base):
+        if base not in layouts:
+            layouts[base] = style_chart_figure(empty_figure(), base).to_plotly_json()['layout']
+        return layouts[base]
+
+    """Send the full history of the selected currencies to the browser"""
+    @app.callback(
+        Output('chart-data', 'data'),
+        Input('currency-dropdown', 'value'),
+        Input('base-dropdown', 'value')
+    )
+    def update_chart_data(selected_currencies, base):
+        """Encode the selected currencies' history for the clientside chart"""
+        base = base or BASE_CURRENCY
+        currencies = tuple(sorted(selected_currencies or []))
         try:
-            df = pd.read_sql(query, engine)
-            
-            if df.empty:
-                return px.line(title='No data available for selected criteria')
-            
-            fig = px.line(df, x='conversion_date', y='conversion_rate', color='currency_code')
-
-            # Add a title to the chart
-            fig.update_layout(title=f"Conversion Rate from Eur to Selected Currencies (Higher value = stronger Euro)")
-            # Add an info icon popover to the title
-            fig.update_layout(
-                title_x=0.5,
-                title_y=0.95,
-                title_font_size=20,
-                title_font_color='#2c3e50',
-                title_font_family='Lato, "Helvetica Neue", Arial, Helvetica, sans-serif'
-            )
-            # Add a tooltip to the chart
-            fig.update_layout(
-                hovermode='x unified',
-                hoverlabel=dict(bgcolor='white', font_size=12, font_family='Lato, "Helvetica Neue", Arial, Helvetica, sans-serif'),
-                hoverlabel_bgcolor='white',
-                hoverlabel_font_size=12,
-                hoverlabel_font_family='Lato, "Helvetica Neue", Arial, Helvetica, sans-serif'
-            )
-            
-            # Update the axis labels
-            fig.update_xaxes(title_text='Date')
-            fig.update_yaxes(title_text='Conversion Rate')
-            
-            # Update the legend
-            fig.update_layout(legend_title_text='Currency')
-            
-            return fig
-            
+            return output_cache.get('update_chart_data', (currencies, base),
+                                    lambda: build_chart_data(currencies, base))
         except Exception as e:
-            print(f"Error updating chart: {e}")
-            return px.line(title='Error loading chart data')
+            print(f"Error updating chart data: {e}")
+            count_error('update_chart_data')
+            return {'error': 'Error loading chart data'}
+
+    def build_chart_data(selected_currencies, base):
+        with phase('query'):
+            df = get_chart_frame(list(selected_currencies), all_time, base)
+        if df.empty:
+            return {'error': 'No data available for selected criteria'}
+        with phase('transform'):
+            return encode_chart_data(df, Config.CHART_WIDTH_PX * 2, get_layout(base))
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='chart', function_name='updateDateRange'),
+        [Output('date-range-filter', 'data'),
+         Output('current-selection', 'data')],
+        [Input(f'btn-{days}', 'n_clicks') for days, _ in Config.DATE_RANGE_OPTIONS]
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='chart', function_name='updateButtonStyles'),
+        [Output(f'btn-{days}', 'className') for days, _ in Config.DATE_RANGE_OPTIONS],
+        Input('current-selection', 'data')
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='chart', function_name='renderChart'),
+        Output('chart', 'figure'),
+        Input('chart-data', 'data'),
+        Input('date-range-filter', 'data')
+    )
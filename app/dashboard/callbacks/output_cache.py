@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from config.settings import Config
+from plotly.io.json import to_json_plotly
+from monitoring.metrics import count_cache_lookup
+
+
+class MemoryBackend:
+    """Least recently used outputs, kept in the memory of one process"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._outputs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get (found, output) for the key"""
+        with self._lock:
+            if key not in self._outputs:
+                return False, None
+            self._outputs.move_to_end(key)
+            return True, self._outputs[key]
+
+    def set(self, key, output):
+        with self._lock:
+            self._outputs[key] = output
+            self._outputs.move_to_end(key)
+            while len(self._outputs) > self.max_entries:
+                self._outputs.popitem(last=False)
+
+
+class FileBackend:
+    """Outputs stored as JSON in a directory, shared by every worker on the host
+
+    Outputs are serialized as Dash serializes callback responses, and read
+    back as plain dicts that Dash sends unchanged: figures keep their typed
+    arrays and components their JSON form. Files are named by a hash of the
+    key and written atomically. Reads touch the file, so the least recently
+    used files are the ones removed once the directory holds more than
+    max_entries outputs.
+    """
+
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f'{digest}.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return False, None
+        except Exception as e:
+            print(f"Error reading cached output {path}: {e}")
+            return False, None
+        if stored['key'] != repr(key):
+            # a hash collision
+            return False, None
+        return True, stored['output']
+
+    def set(self, key, output):
+        try:
+            data = to_json_plotly({'key': repr(key), 'output': output})
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            self._prune()
+        except Exception as e:
+            print(f"Error writing cached output: {e}")
+
+    def _prune(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        for _, path in sorted(entries)[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class OutputCache:
+    """Callback outputs memoized per inputs and data version
+
+    Keys are the callback name, its canonical inputs (sorted currencies,
+    date range, base currency), the version of the cached rate matrix and
+    today's date, which moves the date range windows. An upload changes the
+    version, so outputs of older data are never served again and age out of
+    the backend. Without a backend, or while no matrix is cached, outputs are
+    computed on every call.
+    """
+
+    def __init__(self, rate_cache, backend=None):
+        self.rate_cache = rate_cache
+        self.backend = backend
+
+    def get(self, name, inputs, compute):
+        """Get the output of callback `name` for the inputs, computing it on a miss
+
+        Outputs are only stored when compute returns; errors are not cached.
+        """
+        matrix = self.rate_cache.get() if self.rate_cache is not None and self.backend is not None else None
+        if matrix is None:
+            return compute()
+        key = (name, inputs, matrix.version, date.today().isoformat())
+        found, output = self.backend.get(key)
+        count_cache_lookup(name, found)
+        if found:
+            return output
+        output = compute()
+        self.backend.set(key, output)
+        return output
+
+
+def create_output_cache(rate_cache):
+    """Output cache with the backend selected by OUTPUT_CACHE"""
+    if Config.OUTPUT_CACHE == 'memory':
+        backend = MemoryBackend(Config.OUTPUT_CACHE_SIZE)
+    elif Config.OUTPUT_CACHE == 'file':
+        directory = Config.OUTPUT_CACHE_DIR or os.path.join(tempfile.gettempdir(), 'currency-dashboard-outputs')
+        backend = FileBackend(directory, Config.OUTPUT_CACHE_SIZE)
+    else:
+        backend = None
+    return OutputCache(rate_cache, backend)
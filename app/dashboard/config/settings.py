@@ -20,11 +20,82 @@ class Config:
     POSTGRES_DB = os.environ.get("POSTGRES_DB", "currency_tracker")
     POSTGRES_USER = os.environ.get("POSTGRES_USER", "postgres")
     POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASSWORD", "password")
+
+    # Connection pool settings, shared by every callback in the process
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+    # seconds before a pooled connection is replaced
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+    # executions of the same statement before it is prepared server-side
+    DB_PREPARE_THRESHOLD = int(os.environ.get("DB_PREPARE_THRESHOLD", "5"))
     
     # App settings
     DEBUG_MODE = os.environ.get("DASH_DEBUG_MODE", "false").lower() == "true"
     HOST = "0.0.0.0"
     PORT = 8050
+
+    # Production server settings (gunicorn.conf.py)
+    WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "2"))
+    WEB_THREADS = int(os.environ.get("WEB_THREADS", "4"))
+    WEB_TIMEOUT = int(os.environ.get("WEB_TIMEOUT", "60"))
+    # seconds a readiness probe reuses the last database check
+    HEALTH_CHECK_TTL = int(os.environ.get("HEALTH_CHECK_TTL", "30"))
+    # serve a warming page right away and wait for the database, load the
+    # rate cache and build the layout in the background
+    FAST_STARTUP = os.environ.get("FAST_STARTUP", "false").lower() == "true"
     
     # Chart settings
     DEFAULT_CURRENCY = "USD"
+    DEFAULT_BASE_CURRENCY = "EUR"
+    # seconds between latest-date checks when the layout has no rate cache
+    LAYOUT_CACHE_TTL = int(os.environ.get("LAYOUT_CACHE_TTL", "300"))
+    # Series longer than two points per pixel of chart width are downsampled
+    CHART_WIDTH_PX = int(os.environ.get("CHART_WIDTH_PX", "1000"))
+    # long ranges are charted from the weekly or monthly rollups (coarsest
+    # first) when the range still spans this many periods
+    CHART_MIN_POINTS = int(os.environ.get("CHART_MIN_POINTS", "250"))
+    # rollups kept by the upload job (its ROLLUP_RESOLUTIONS)
+    ROLLUP_RESOLUTIONS = os.environ.get("ROLLUP_RESOLUTIONS", "week,month").split(",")
+    # 'minmax' keeps every bucket's extremes, 'lttb' keeps the visual shape
+    DOWNSAMPLE_METHOD = os.environ.get("DOWNSAMPLE_METHOD", "minmax")
+    # send the selected currencies' history once and change date ranges in the browser
+    CLIENTSIDE_CHART = os.environ.get("CLIENTSIDE_CHART", "false").lower() == "true"
+
+    # Rate cache settings
+    # upper bound on the in-memory rate matrix; older history is served from SQL
+    RATE_CACHE_MAX_MB = int(os.environ.get("RATE_CACHE_MAX_MB", "64"))
+    # directory of the snapshots published by the upload job ('' = disabled)
+    SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "")
+    # reload the rate cache when the upload job NOTIFYs this channel
+    LISTEN_FOR_UPDATES = os.environ.get("LISTEN_FOR_UPDATES", "true").lower() == "true"
+    RATES_NOTIFY_CHANNEL = os.environ.get("RATES_NOTIFY_CHANNEL", "rates_updated")
+    # shared secret the upload job sends to invalidate the cache
+    CACHE_INVALIDATE_TOKEN = os.environ.get("CACHE_INVALIDATE_TOKEN", "")
+    # base currencies whose cross rates are kept in memory at once
+    CROSS_RATE_CACHE_SIZE = int(os.environ.get("CROSS_RATE_CACHE_SIZE", "8"))
+    # memoized callback outputs: 'memory' per process, 'file' shared by the
+    # workers of a host through OUTPUT_CACHE_DIR, or 'off'
+    OUTPUT_CACHE = os.environ.get("OUTPUT_CACHE", "memory").lower()
+    OUTPUT_CACHE_SIZE = int(os.environ.get("OUTPUT_CACHE_SIZE", "256"))
+    # directory of the 'file' output cache ('' = a directory in the system temp dir)
+    OUTPUT_CACHE_DIR = os.environ.get("OUTPUT_CACHE_DIR", "")
+    # brotli or gzip compression of responses the browser accepts compressed
+    COMPRESS_RESPONSES = os.environ.get("COMPRESS_RESPONSES", "true").lower() == "true"
+
+    # Rates API settings (/rates)
+    # seconds clients and proxies may reuse a response without revalidating
+    API_CACHE_MAX_AGE = int(os.environ.get("API_CACHE_MAX_AGE", "300"))
+    # seconds the database's data version is reused while the rate cache is not loaded
+    API_VERSION_TTL = int(os.environ.get("API_VERSION_TTL", "30"))
+    # rows per streamed batch
+    API_BATCH_ROWS = int(os.environ.get("API_BATCH_ROWS", "10000"))
+
+    # Monitoring settings
+    # callbacks slower than this are counted and may be logged
+    SLOW_CALLBACK_MS = float(os.environ.get("SLOW_CALLBACK_MS", "500"))
+    # fraction of slow callbacks whose timings and inputs are printed
+    SLOW_LOG_SAMPLE_RATE = float(os.environ.get("SLOW_LOG_SAMPLE_RATE", "0.1"))
+    # print the slowest imports at startup, as python -X importtime would
+    IMPORT_TIME_REPORT = os.environ.get("IMPORT_TIME_REPORT", "false").lower() == "true"
@@ -1,29 +1,40 @@
-import os
 import time
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import OperationalError
 
+from config.settings import Config
+
 class DatabaseManager:
     """Manages database connections and operations"""
-    
-    def __init__(self):
+
+    def __init__(self, config=Config):
+        self.config = config
         self.engine = None
+        # (monotonic time, result) of the last connection test
+        self._last_check = (None, False)
         self._setup_connection()
-    
+
     def _setup_connection(self):
-        """Setup database connection with retry logic"""
-        # Use Docker service name for database connection
-        db_host = os.environ.get("POSTGRES_HOST", "currency-track-database")
-        db_port = os.environ.get("POSTGRES_PORT", "5432")
-        db_name = os.environ.get("POSTGRES_DB", "currency_tracker")
-        db_user = os.environ.get("POSTGRES_USER", "postgres")
-        db_pass = os.environ.get("POSTGRES_PASSWORD", "password")
-        
-        print(f"Connecting to database: {db_host}:{db_port}/{db_name}")
-        
-        connection_string = f'postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}'
-        self.engine = create_engine(connection_string)
-    
+        """Setup the pooled database engine"""
+        config = self.config
+        print(f"Connecting to database: {config.POSTGRES_HOST}:{config.POSTGRES_PORT}/{config.POSTGRES_DB}")
+
+        # psycopg 3 binds parameters server-side and prepares statements that
+        # a connection executes more than prepare_threshold times
+        connection_string = (
+            f'postgresql+psycopg://{config.POSTGRES_USER}:{config.POSTGRES_PASSWORD}'
+            f'@{config.POSTGRES_HOST}:{config.POSTGRES_PORT}/{config.POSTGRES_DB}'
+        )
+        self.engine = create_engine(
+            connection_string,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            pool_pre_ping=config.DB_POOL_PRE_PING,
+            connect_args={'prepare_threshold': config.DB_PREPARE_THRESHOLD}
+        )
+
     def wait_for_database(self, max_retries=30, delay=2):
         """Wait for database to be ready"""
         for attempt in range(max_retries):
@@ -31,6 +42,7 @@ class DatabaseManager:
                 with self.engine.connect() as connection:
                     connection.execute(text("SELECT 1"))
                     print("Database connection successful!")
+                    self._last_check = (time.monotonic(), True)
                     return True
             except OperationalError as e:
                 print(f"Database not ready (attempt {attempt + 1}/{max_retries}): {e}")
@@ -40,17 +52,40 @@ class DatabaseManager:
                     print("Failed to connect to database after all retries")
                     return False
         return False
-    
+
     def get_engine(self):
         """Get the database engine"""
         return self.engine
-    
+
     def test_connection(self):
         """Test if database connection is working"""
         try:
             with self.engine.connect() as connection:
                 connection.execute(text("SELECT 1"))
-                return True
+                healthy = True
         except Exception as e:
             print(f"Database connection test failed: {e}")
-            return False
+            healthy = False
+        self._last_check = (time.monotonic(), healthy)
+        return healthy
+
+    def is_healthy(self, max_age=None):
+        """Result of the last connection test, retested once it is older than max_age seconds"""
+        max_age = max_age if max_age is not None else self.config.HEALTH_CHECK_TTL
+        checked_at, healthy = self._last_check
+        if checked_at is None or time.monotonic() - checked_at > max_age:
+            healthy = self.test_connection()
+        return healthy
+
+    def dispose(self):
+        """Drop pooled connections inherited from a parent process after fork"""
+        self.engine.dispose(close=False)
+
+_db_manager = None
+
+def get_db_manager():
+    """Get the process-wide database manager, so every caller shares one pool"""
+    global _db_manager
+    if _db_manager is None:
+        _db_manager = DatabaseManager()
+    return _db_manager
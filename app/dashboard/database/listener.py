@@ -0,0 +1,84 @@
+import threading
+
+from psycopg import sql
+
+from config.settings import Config
+
+
+class RateListener:
+    """Reloads the rate cache as soon as the upload job publishes new rates
+
+    The upload job sends NOTIFY on RATES_NOTIFY_CHANNEL with the new data
+    version after loading rows. Every serving process holds one connection,
+    detached from the engine's pool, that LISTENs on the channel from a
+    background thread. A notification reloads the rate cache (unless it
+    already holds that version) and rebuilds the layout with the new
+    currency options; cross rates, analytics and memoized outputs are keyed
+    on the version and follow. Nothing is queried while waiting. Once
+    listening, and again after every reconnect, the database's version is
+    checked once to catch up on notifications sent while not listening.
+    """
+
+    def __init__(self, db_manager, rate_cache, layout_cache=None, ready=None, channel=None,
+                 reconnect_delay=5, wait_timeout=60):
+        self.db_manager = db_manager
+        self.rate_cache = rate_cache
+        self.layout_cache = layout_cache
+        # set once the first rate cache load is done
+        self.ready = ready if ready is not None else threading.Event()
+        self.channel = channel if channel is not None else Config.RATES_NOTIFY_CHANNEL
+        self.reconnect_delay = reconnect_delay
+        # seconds between checks of the stop flag while no notification arrives
+        self.wait_timeout = wait_timeout
+        self._stop = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Listen in a background thread, once per process (after the fork under gunicorn)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name='rate-listener', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _connect(self):
+        """Connection of the engine, taken out of its pool and set to LISTEN"""
+        connection = self.db_manager.get_engine().raw_connection()
+        connection.detach()
+        conn = connection.driver_connection
+        conn.rollback()
+        conn.autocommit = True
+        conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+        return connection
+
+    def _apply(self, version=None):
+        """Swap in the rates of the given (or the database's) version and rebuild the layout"""
+        self.rate_cache.refresh(version)
+        if self.layout_cache is not None:
+            self.layout_cache.get()
+
+    def _run(self):
+        self.ready.wait()
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                print(f"Listening for rate updates on {self.channel}")
+                self._apply()
+                while not self._stop.is_set():
+                    for notify in connection.driver_connection.notifies(timeout=self.wait_timeout):
+                        print(f"Rate update notification: version {notify.payload}")
+                        self._apply(notify.payload or None)
+            except Exception as e:
+                print(f"Rate update listener error, reconnecting in {self.reconnect_delay}s: {e}")
+                self._stop.wait(self.reconnect_delay)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
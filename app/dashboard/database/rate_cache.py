@@ -0,0 +1,405 @@
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import text
+
+from config.settings import Config
+
+# the currency every stored rate is quoted from
+BASE_CURRENCY = 'EUR'
+
+STATS_QUERY = """
+SELECT MAX(conversion_date) AS latest_date, COUNT(*) AS row_count,
+       COUNT(DISTINCT currency_code) AS currency_count
+FROM conversion_rates
+"""
+
+# only the most recent max_dates dates are loaded to respect the memory bound
+HISTORY_QUERY = """
+SELECT conversion_date, currency_code, conversion_rate::float8 AS conversion_rate
+FROM conversion_rates
+WHERE conversion_date IN (
+    SELECT DISTINCT conversion_date
+    FROM conversion_rates
+    ORDER BY conversion_date DESC
+    LIMIT :max_dates
+)
+"""
+
+
+class RateMatrix:
+    """Immutable dense date x currency matrix of conversion rates
+
+    Rows are dates in ascending order, columns are currency codes. Days where
+    the ECB did not publish a rate for a currency hold NaN. Running sums and
+    counts per currency answer window averages in constant time.
+    """
+
+    def __init__(self, dates, codes, values, version, complete=True, cum_sum=None, cum_count=None,
+                 base=BASE_CURRENCY):
+        self.dates = dates
+        self.codes = list(codes)
+        self.values = values
+        self.version = version
+        # the currency the rates are quoted from
+        self.base = base
+        # False when older history was dropped to respect the memory bound
+        self.complete = complete
+        self._columns = {code: i for i, code in enumerate(self.codes)}
+        # prefix sums with a leading zero row: window [lo, hi) = cum[hi] - cum[lo]
+        if cum_sum is None or cum_count is None:
+            published = ~np.isnan(values)
+            cum_sum = np.zeros((len(dates) + 1, len(self.codes)))
+            cum_count = np.zeros((len(dates) + 1, len(self.codes)), dtype=np.int64)
+            np.nancumsum(values, axis=0, out=cum_sum[1:])
+            np.cumsum(published, axis=0, out=cum_count[1:])
+        self.cum_sum = cum_sum
+        self.cum_count = cum_count
+        # index of the last published rate per currency (-1 if none): the
+        # first row where the running count reaches its total, minus one
+        self._last_valid = np.argmax(cum_count == cum_count[-1], axis=0) - 1
+
+    @classmethod
+    def from_frame(cls, df, version=None, complete=True):
+        """Build the matrix from a long dataframe of conversion rates"""
+        wide = df.pivot(index='conversion_date', columns='currency_code',
+                        values='conversion_rate').sort_index()
+        dates = pd.to_datetime(wide.index).values.astype('datetime64[D]')
+        values = np.ascontiguousarray(wide.to_numpy(dtype=np.float64))
+        if version is None:
+            version = f"{dates[-1]}:{len(df)}" if len(dates) else None
+        return cls(dates, wide.columns, values, version, complete)
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """Memory-map a snapshot published by the upload job
+
+        The snapshot is currency-major with a padding row ahead of every
+        currency's dates, so each column reshapes into a date x currency view
+        of the mapped file without copying. Worker processes mapping the same
+        file share one page-cached copy.
+        """
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        metadata = table.schema.metadata
+        codes = json.loads(metadata[b'codes'])
+        dates = np.asarray(json.loads(metadata[b'dates']), dtype=np.int64).astype('datetime64[D]')
+
+        def block(name):
+            column = table.column(name)
+            array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+            return array.to_numpy().reshape(len(codes), len(dates) + 1).T
+
+        return cls(dates, codes, block('rate')[1:], json.loads(metadata[b'version']),
+                   cum_sum=block('cum_sum'), cum_count=block('cum_count'))
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.dates.nbytes + self.cum_sum.nbytes + self.cum_count.nbytes
+
+    def has_currency(self, code):
+        return code in self._columns
+
+    def covers(self, start_date):
+        """Check whether the matrix holds all history on or after start_date"""
+        return self.complete or (len(self.dates) and self.dates[0] <= start_date)
+
+    def column(self, code):
+        """Get the dates and rates (NaN removed) for a single currency"""
+        col = self.values[:, self._columns[code]]
+        valid = ~np.isnan(col)
+        return self.dates[valid], col[valid]
+
+    def latest_date(self, code):
+        """Get the latest date with a published rate for a currency"""
+        last = self._last_valid[self._columns[code]]
+        return self.dates[last] if last >= 0 else None
+
+    def window_mean(self, code, start_date, end_date):
+        """Mean rate of a currency over [start_date, end_date], None if no data"""
+        col = self._columns[code]
+        lo = np.searchsorted(self.dates, start_date, side='left')
+        hi = np.searchsorted(self.dates, end_date, side='right')
+        count = self.cum_count[hi, col] - self.cum_count[lo, col]
+        if count == 0:
+            return None
+        return (self.cum_sum[hi, col] - self.cum_sum[lo, col]) / count
+
+    def rebase(self, base):
+        """Rates from the base currency to every currency, as a new matrix
+
+        The stored rates are EUR to X, so base to X is (EUR to X) / (EUR to
+        base) on the same date: one division of the whole matrix by the base
+        column. EUR is added as a column (1 / EUR to base). Dates where
+        either rate is missing stay NaN.
+        """
+        if base == self.base:
+            return self
+        base_rates = self.values[:, self._columns[base]]
+        values = np.empty((len(self.dates), len(self.codes) + 1))
+        np.divide(self.values, base_rates[:, None], out=values[:, :-1])
+        np.divide(1.0, base_rates, out=values[:, -1])
+        return RateMatrix(self.dates, self.codes + [BASE_CURRENCY], values, self.version, self.complete,
+                          base=base)
+
+    def cross_rates(self, bases, quotes, start_date=None):
+        """Rates for every base x quote pair as a date x base x quote array
+
+        One broadcast division over the date-aligned matrix answers all the
+        pairs at once; EUR may be used as a base or quote.
+        """
+        start = 0 if start_date is None else np.searchsorted(self.dates, start_date)
+        values = self.values[start:]
+
+        def columns(codes):
+            return np.stack([np.ones(len(values)) if code == BASE_CURRENCY
+                             else values[:, self._columns[code]] for code in codes], axis=1)
+
+        return columns(quotes)[:, None, :] / columns(bases)[:, :, None]
+
+    def period_starts(self, resolution, start_date=None):
+        """Distinct starts of the 'week' (from Monday) or 'month' periods of the dates"""
+        start = 0 if start_date is None else np.searchsorted(self.dates, start_date)
+        dates = self.dates[start:]
+        if resolution == 'week':
+            # 1970-01-01 was a Thursday
+            days = dates.astype(np.int64)
+            starts = (days - (days + 3) % 7).astype('datetime64[D]')
+        else:
+            starts = dates.astype(f'datetime64[{resolution[0].upper()}]').astype('datetime64[D]')
+        return np.unique(starts)
+
+    def rollup(self, codes, start_date=None, resolution='month'):
+        """Low and high rate per period of the given currencies, as a long dataframe
+
+        Every period gives two rows dated at its start: its low and its high,
+        the low first when the period closed at or above its open, as the
+        chart query reads them from the database's rate_rollups. Drawn as a
+        line they keep the extremes of the daily rates, as minmax
+        downsampling does.
+        """
+        starts = self.period_starts(resolution, start_date)
+        if start_date is not None:
+            starts = starts[starts >= start_date]
+        if len(starts) == 0:
+            return pd.DataFrame(columns=['conversion_date', 'currency_code', 'conversion_rate'])
+        bounds = np.searchsorted(self.dates, starts)
+        positions = np.arange(len(self.dates))
+        frames = []
+        for code in codes:
+            if code not in self._columns:
+                continue
+            col = self.values[:, self._columns[code]]
+            published = ~np.isnan(col)
+            count = np.diff(np.append(self.cum_count[bounds, self._columns[code]],
+                                      self.cum_count[-1, self._columns[code]]))
+            valid = count > 0
+            # fmin/fmax skip the days without a rate
+            low = np.fmin.reduceat(col, bounds)[valid]
+            high = np.fmax.reduceat(col, bounds)[valid]
+            first = np.minimum.reduceat(np.where(published, positions, len(col)), bounds)[valid]
+            last = np.maximum.reduceat(np.where(published, positions, -1), bounds)[valid]
+            rising = col[last] >= col[first]
+            frames.append(pd.DataFrame({
+                'conversion_date': np.repeat(starts[valid], 2),
+                'currency_code': code,
+                'conversion_rate': np.column_stack([np.where(rising, low, high),
+                                                    np.where(rising, high, low)]).ravel()
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['conversion_date', 'currency_code', 'conversion_rate'])
+        return pd.concat(frames, ignore_index=True)
+
+    def to_long(self, codes, start_date=None):
+        """Slice the matrix into a long dataframe for the given currencies"""
+        start = 0 if start_date is None else np.searchsorted(self.dates, start_date)
+        frames = []
+        for code in codes:
+            if code not in self._columns:
+                continue
+            col = self.values[start:, self._columns[code]]
+            valid = ~np.isnan(col)
+            frames.append(pd.DataFrame({
+                'conversion_date': self.dates[start:][valid],
+                'currency_code': code,
+                'conversion_rate': col[valid]
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['conversion_date', 'currency_code', 'conversion_rate'])
+        return pd.concat(frames, ignore_index=True)
+
+
+class RateCache:
+    """Process-wide cache of the conversion rate history
+
+    The matrix is loaded once and shared by every callback. invalidate() marks
+    it stale after the upload job inserts new rows; the next reader reloads it
+    and swaps the new matrix in atomically. The invalidation counter lives in
+    shared memory, so when the cache is created before forking worker
+    processes, an invalidation received by one worker reaches all of them.
+    When the upload job published a
+    snapshot of the current data version, it is memory-mapped instead of
+    being read from the database.
+    """
+
+    def __init__(self, max_bytes=None, snapshot_dir=None):
+        self.max_bytes = max_bytes if max_bytes is not None else Config.RATE_CACHE_MAX_MB * 1024 * 1024
+        self.snapshot_dir = snapshot_dir if snapshot_dir is not None else Config.SNAPSHOT_DIR
+        self.engine = None
+        self._matrix = None
+        # bumped by invalidate(); a matrix loaded at an older value is stale
+        self._generation = multiprocessing.Value('q', 0)
+        self._loaded_generation = 0
+        self._lock = threading.Lock()
+
+    def load(self, engine):
+        """Load the rate history from the database into memory"""
+        self.engine = engine
+        with self._lock:
+            self._reload()
+        return self._matrix
+
+    def _reload(self):
+        generation = self._generation.value
+        try:
+            with self.engine.connect() as connection:
+                stats = connection.execute(text(STATS_QUERY)).mappings().one()
+                if stats['latest_date'] is None:
+                    print("Rate cache: conversion_rates is empty, nothing to cache")
+                    return
+                version = f"{stats['latest_date']}:{stats['row_count']}"
+                matrix, source = self._load_snapshot(version), 'snapshot'
+                if matrix is None:
+                    # bound the dense matrix size: rates, running sums and
+                    # counts take 3 x 8 bytes per date and currency
+                    max_dates = max(1, self.max_bytes // (max(stats['currency_count'], 1) * 24))
+                    df = pd.read_sql(text(HISTORY_QUERY), connection, params={'max_dates': max_dates})
+                    complete = len(df) == stats['row_count']
+                    matrix, source = RateMatrix.from_frame(df, version=version, complete=complete), 'database'
+            self._matrix = matrix
+            self._loaded_generation = generation
+            print(f"Rate cache: loaded {len(matrix.dates)} dates x "
+                  f"{len(matrix.codes)} currencies ({matrix.nbytes / 1e6:.1f} MB) "
+                  f"from the {source}, version {version}")
+        except Exception as e:
+            print(f"Error loading rate cache: {e}")
+
+    def _load_snapshot(self, version):
+        """Map the published snapshot if it holds the given data version"""
+        if not self.snapshot_dir:
+            return None
+        try:
+            with open(os.path.join(self.snapshot_dir, 'latest.json'), 'r') as f:
+                latest = json.load(f)
+            if latest['version'] != version:
+                print(f"Rate cache: snapshot version {latest['version']} is not {version}, "
+                      f"reading from the database")
+                return None
+            return RateMatrix.from_snapshot(os.path.join(self.snapshot_dir, latest['file']))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error mapping rate snapshot: {e}")
+            return None
+
+    def invalidate(self):
+        """Mark the cached matrix stale so the next reader reloads it"""
+        with self._generation.get_lock():
+            self._generation.value += 1
+
+    def refresh(self, version=None):
+        """Reload now unless the matrix already holds the given data version
+
+        Without a version, the database's current version is queried. Only
+        this process reloads, unlike invalidate().
+        """
+        if self.engine is None:
+            return self._matrix
+        if version is None:
+            try:
+                with self.engine.connect() as connection:
+                    stats = connection.execute(text(STATS_QUERY)).mappings().one()
+                version = f"{stats['latest_date']}:{stats['row_count']}"
+            except Exception as e:
+                print(f"Error checking the rate cache version: {e}")
+                return self._matrix
+        with self._lock:
+            if self._matrix is None or self._matrix.version != version:
+                self._reload()
+        return self._matrix
+
+    def peek(self):
+        """Get the current matrix without reloading it"""
+        return self._matrix
+
+    def is_stale(self):
+        return self._generation.value != self._loaded_generation
+
+    def get(self):
+        """Get the current matrix, reloading it first if it was invalidated
+
+        Returns None when nothing could be loaded; callers fall back to SQL.
+        """
+        if (self.is_stale() or self._matrix is None) and self.engine is not None:
+            # only one thread reloads, the others keep serving the old matrix
+            if self._lock.acquire(blocking=self._matrix is None):
+                try:
+                    if self.is_stale() or self._matrix is None:
+                        self._reload()
+                finally:
+                    self._lock.release()
+        return self._matrix
+
+
+class CrossRateCache:
+    """Rebased rate matrices per base currency, computed on first use
+
+    Each entry serves every date range and scorecard window of its base, as
+    the rebased matrix carries its own running sums. Entries are keyed on the
+    data version, so a reload of the rate cache replaces them, and the least
+    recently used base is dropped beyond max_entries.
+    """
+
+    def __init__(self, rate_cache, max_entries=None):
+        self.rate_cache = rate_cache
+        self.max_entries = max_entries if max_entries is not None else Config.CROSS_RATE_CACHE_SIZE
+        self._matrices = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, base):
+        """Get the rates from base to every currency, None if not cached"""
+        matrix = self.rate_cache.get()
+        if matrix is None or base == BASE_CURRENCY:
+            return matrix
+        if not matrix.has_currency(base):
+            return None
+        key = (matrix.version, base)
+        with self._lock:
+            if key in self._matrices:
+                self._matrices.move_to_end(key)
+                return self._matrices[key]
+        rebased = matrix.rebase(base)
+        with self._lock:
+            self._matrices[key] = rebased
+            while len(self._matrices) > self.max_entries:
+                self._matrices.popitem(last=False)
+        return rebased
+
+
+_rate_cache = RateCache()
+
+
+def get_rate_cache():
+    """Get the process-wide rate cache"""
+    return _rate_cache
+
+
+def days_ago(days):
+    """Start date for a date range of the given number of days"""
+    return np.datetime64(date.today()) - np.timedelta64(days, 'D')
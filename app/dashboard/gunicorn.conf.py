@@ -0,0 +1,21 @@
+"""Gunicorn settings for the dashboard, run with gunicorn -c gunicorn.conf.py wsgi:server"""
+from config.settings import Config
+
+bind = f"{Config.HOST}:{Config.PORT}"
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+timeout = Config.WEB_TIMEOUT
+# build the app (layout, currency options, rate cache) once in the master;
+# workers share it copy-on-write
+preload_app = True
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    """Give every worker its own database connections, warm-up and rate update listener"""
+    from database.db_manager import get_db_manager
+    get_db_manager().dispose()
+    # the warm-up is a no-op unless FAST_STARTUP deferred it
+    from app import start_background_tasks
+    from wsgi import app
+    start_background_tasks(app, Config)
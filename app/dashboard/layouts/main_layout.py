@@ -1,30 +1,47 @@
+import threading
+import time
+from datetime import date
+
 import dash_bootstrap_components as dbc
 from config.settings import Config
 from dash import html, dcc
-from database.db_manager import DatabaseManager
+from database.db_manager import get_db_manager
+from database.rate_cache import BASE_CURRENCY, days_ago
 from sqlalchemy import text
 
 INFO_HEADER = 'Source: European Central Bank'
 INFO_TEXT = 'Conversion rate data as provided by the European Central Bank (ECB). ' + \
 'Historical time periods are relative to the latest published date.'
 
-def get_currency_options():
-    """Get currency options directly from database"""
+CURRENCY_OPTIONS_QUERY = """
+SELECT DISTINCT currency_code
+FROM conversion_rates
+WHERE conversion_date >= CURRENT_DATE - CAST(:days AS integer)
+ORDER BY currency_code
+"""
+
+LATEST_DATE_QUERY = """
+SELECT MAX(conversion_date) FROM conversion_rates
+"""
+
+# currencies without a rate in this many days are not offered
+CURRENCY_OPTIONS_DAYS = 60
+
+def get_currency_options(rate_cache=None):
+    """Get the currencies with recent rates, from the rate cache if loaded"""
     try:
-        # Initialize database manager
-        db_manager = DatabaseManager()
-        engine = db_manager.get_engine()
-        
-        query = """
-        SELECT DISTINCT currency_code
-        FROM conversion_rates
-        WHERE conversion_date >= CURRENT_DATE - INTERVAL '60 days'
-        ORDER BY currency_code
-        """
-        
-        with engine.connect() as connection:
-            raw_results = connection.execute(text(query))
-            results = [r[0] for r in raw_results.fetchall()]
+        matrix = rate_cache.get() if rate_cache is not None else None
+        if matrix is not None:
+            start_date = days_ago(CURRENCY_OPTIONS_DAYS)
+            results = [code for code in matrix.codes
+                       if matrix.latest_date(code) is not None and matrix.latest_date(code) >= start_date]
+        else:
+            # Reuse the app's shared engine and pool
+            engine = get_db_manager().get_engine()
+
+            with engine.connect() as connection:
+                raw_results = connection.execute(text(CURRENCY_OPTIONS_QUERY), {'days': CURRENCY_OPTIONS_DAYS})
+                results = [r[0] for r in raw_results.fetchall()]
         
         currency_options = [{'label': currency, 'value': currency} for currency in sorted(results)]
         print(f"Found {len(currency_options)} currency options")
@@ -34,10 +51,74 @@ def get_currency_options():
         print(f"Error getting currency options: {e}")
         return []
 
-def create_main_layout():
+class LayoutCache:
+    """Main layout rebuilt only when the data changes
+
+    Used as a layout function, so every page load gets fresh currency
+    options. The layout is keyed on the rate cache version (or, without a
+    loaded cache, on the latest conversion_date, queried at most once per
+    LAYOUT_CACHE_TTL seconds) and on today's date, which the options are
+    relative to. Page loads do not query the database while the key holds.
+    """
+
+    def __init__(self, rate_cache=None, ttl=None):
+        self.rate_cache = rate_cache
+        self.ttl = ttl if ttl is not None else Config.LAYOUT_CACHE_TTL
+        self._key = None
+        self._layout = None
+        # (monotonic time, value) of the last latest-date query
+        self._latest_date = (None, None)
+        self._lock = threading.Lock()
+
+    def _data_version(self):
+        matrix = self.rate_cache.get() if self.rate_cache is not None else None
+        if matrix is not None:
+            return matrix.version
+        checked_at, latest_date = self._latest_date
+        if checked_at is None or time.monotonic() - checked_at > self.ttl:
+            try:
+                with get_db_manager().get_engine().connect() as connection:
+                    latest_date = connection.execute(text(LATEST_DATE_QUERY)).scalar()
+            except Exception as e:
+                print(f"Error getting latest conversion date: {e}")
+            self._latest_date = (time.monotonic(), latest_date)
+        return latest_date
+
+    def get(self):
+        """Get the layout for the current data version"""
+        key = (self._data_version(), date.today())
+        if key != self._key:
+            with self._lock:
+                if key != self._key:
+                    currency_options = get_currency_options(self.rate_cache)
+                    self._layout = create_main_layout(currency_options)
+                    # retry on the next page load if the options failed to load
+                    self._key = key if currency_options else None
+        return self._layout
+
+def create_warming_layout():
+    """Page served while the app is still warming up
+
+    The interval polls /readyz from the browser (see app.py) and reloads the
+    page once the dashboard is ready.
+    """
+    return html.Div([
+        html.H1('Euro Conversion Rates', style={'padding': '20px'}),
+        html.H4('Loading conversion rates, the dashboard will appear in a moment...',
+                style={'padding': '20px', 'color': '#6c757d'}),
+        dcc.Interval(id='warmup-interval', interval=2000)
+    ])
+
+def quote_options(base_options, base):
+    """Options of the currency dropdown: every base option but the base itself"""
+    return [option for option in base_options if option['value'] != base]
+
+def create_main_layout(currency_options=None):
     """Create the main layout for the dashboard"""
-    # Get currency options once when creating layout
-    currency_options = get_currency_options()
+    if currency_options is None:
+        currency_options = get_currency_options()
+    # any currency can be the base; rates from it are EUR cross rates
+    base_options = [{'label': BASE_CURRENCY, 'value': BASE_CURRENCY}] + currency_options
     # spacing to keep to the left of page elements
     SIDE_MARGIN = '20px'
     # define horizontal divider style (resused)
@@ -106,7 +187,8 @@ def create_main_layout():
                 html.Div(
                     dcc.Dropdown(
                         id='currency-dropdown',
-                        options=currency_options,  # Static options from database
+                        # Cached per data version by LayoutCache; follows the base
+                        options=quote_options(base_options, Config.DEFAULT_BASE_CURRENCY),
                         value=[Config.DEFAULT_CURRENCY],
                         multi=True,
                         placeholder='Select currencies',
@@ -114,6 +196,26 @@ def create_main_layout():
                     ),
                     className='mb-2',
                     style={'display': 'inline-block', 'verticalAlign': 'middle'}
+                ),
+                # Base currency dropdown
+                html.H4('From:',
+                className='mb-2',
+                style={
+                    'display': 'inline-block',
+                    'marginBottom': '20px',
+                    'marginTop': '20px',
+                    'marginLeft': '30px'
+                }),
+                html.Div(
+                    dcc.Dropdown(
+                        id='base-dropdown',
+                        options=base_options,
+                        value=Config.DEFAULT_BASE_CURRENCY,
+                        clearable=False,
+                        style={'width': '120px', 'marginLeft': '10px'}
+                    ),
+                    className='mb-2',
+                    style={'display': 'inline-block', 'verticalAlign': 'middle'}
                 )
             ])
         ]),
@@ -130,7 +232,9 @@ def create_main_layout():
             html.H4('Date Range:', style={'display': 'inline-block', 'marginRight': '10px'}),
             date_range_radio,
             dcc.Store(id='date-range-filter'),
-            dcc.Store(id='current-selection')
+            dcc.Store(id='current-selection'),
+            # full history of the selected currencies in clientside chart mode
+            dcc.Store(id='chart-data')
         ], style={'marginBottom': '20px'}),
         
         # Chart
@@ -0,0 +1,33 @@
+from flask import g, request
+
+from monitoring.metrics import count_compression
+
+CALLBACK_PATH = '/_dash-update-component'
+
+
+def enable_compression(server):
+    """Compress responses with brotli or gzip and count the bytes saved on callbacks
+
+    flask-compress picks the encoding from the browser's Accept-Encoding.
+    Flask runs after_request hooks in the reverse order of registration, so
+    the hook registered before it sees the compressed callback response and
+    the one registered after it the uncompressed one.
+    """
+    from flask_compress import Compress
+
+    @server.after_request
+    def count_sent_bytes(response):
+        uncompressed = g.pop('uncompressed_bytes', None)
+        encoding = response.headers.get('Content-Encoding')
+        if uncompressed is not None and encoding:
+            count_compression(encoding, uncompressed, response.content_length)
+        return response
+
+    server.config.setdefault('COMPRESS_ALGORITHM', ['br', 'gzip'])
+    Compress(server)
+
+    @server.after_request
+    def measure_uncompressed_bytes(response):
+        if request.path.endswith(CALLBACK_PATH) and response.content_length is not None:
+            g.uncompressed_bytes = response.content_length
+        return response
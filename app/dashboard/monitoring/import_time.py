@@ -0,0 +1,91 @@
+import sys
+import threading
+import time
+
+from config.settings import Config
+
+
+class _TimedLoader:
+    """Loader wrapper timing how long a module takes to execute"""
+
+    def __init__(self, loader, timer):
+        self._loader = loader
+        self._timer = timer
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        spec = module.__spec__
+        self._timer._enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer._exit(spec.name)
+            # hand the module back its own loader
+            spec.loader = self._loader
+            module.__loader__ = self._loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class ImportTimer:
+    """Records the import time of every module, as python -X importtime does
+
+    Installed first on sys.meta_path, it lets the other finders locate each
+    module and wraps the loader to time the module's execution. Cumulative
+    time includes the modules imported while executing; self time does not.
+    """
+
+    def __init__(self):
+        # module name -> (self seconds, cumulative seconds)
+        self.timings = {}
+        self._local = threading.local()
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def _enter(self):
+        stack = self._local.__dict__.setdefault('stack', [])
+        # [start, seconds spent in nested imports]
+        stack.append([time.perf_counter(), 0.0])
+
+    def _exit(self, name):
+        stack = self._local.stack
+        start, nested = stack.pop()
+        cumulative = time.perf_counter() - start
+        if stack:
+            stack[-1][1] += cumulative
+        self.timings[name] = (cumulative - nested, cumulative)
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def report(self, top=25):
+        """Print the modules with the largest cumulative import times"""
+        print(f"Import times of {len(self.timings)} modules (ms, self / cumulative):")
+        slowest = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for name, (own, cumulative) in slowest:
+            print(f"  {own * 1000:8.1f} {cumulative * 1000:8.1f}  {name}")
+
+
+def install_from_env():
+    """Start timing imports when IMPORT_TIME_REPORT is enabled, else return None"""
+    if not Config.IMPORT_TIME_REPORT:
+        return None
+    return ImportTimer().install()
@@ -0,0 +1,200 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from config.settings import Config
+
+# histogram buckets in seconds and in bytes
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+
+class Histogram:
+    """Histogram rendered in the Prometheus text exposition format"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # label tuple -> [per-bucket counts, sum, count]
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._series.items()):
+            labels = ''.join(f'{k}="{v}",' for k, v in key)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels}le="{bound:g}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{labels}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels.rstrip(",")}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{labels.rstrip(",")}}} {count}')
+        return lines
+
+
+class Counter:
+    """Counter rendered in the Prometheus text exposition format"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._series = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._series.items()):
+            labels = ','.join(f'{k}="{v}"' for k, v in key)
+            lines.append(f'{self.name}{{{labels}}} {value}')
+        return lines
+
+
+class CallbackMetrics:
+    """Per-process timings of Dash callbacks, split into phases
+
+    Callbacks mark their phases with phase('query'), phase('figure'), ...;
+    the time not covered by any phase (Dash's JSON serialization and
+    dispatch) is recorded as the 'overhead' phase.
+    """
+
+    def __init__(self, slow_ms=None, slow_sample_rate=None):
+        self.slow_ms = slow_ms if slow_ms is not None else Config.SLOW_CALLBACK_MS
+        self.slow_sample_rate = slow_sample_rate if slow_sample_rate is not None else Config.SLOW_LOG_SAMPLE_RATE
+        self.duration = Histogram(
+            'dash_callback_duration_seconds', 'Callback time including serialization.', DURATION_BUCKETS)
+        self.phases = Histogram(
+            'dash_callback_phase_seconds', 'Callback time per phase.', DURATION_BUCKETS)
+        self.payload = Histogram(
+            'dash_callback_payload_bytes', 'Size of the serialized callback response.', BYTES_BUCKETS)
+        self.errors = Counter('dash_callback_errors_total', 'Callbacks that failed.')
+        self.slow = Counter('dash_callback_slow_total', 'Callbacks slower than the slow threshold.')
+        self.cache_lookups = Counter(
+            'dash_callback_cache_lookups_total', 'Memoized callback output lookups by result (hit or miss).')
+        self.uncompressed_bytes = Counter(
+            'dash_response_uncompressed_bytes_total', 'Callback response bytes before compression.')
+        self.sent_bytes = Counter(
+            'dash_response_sent_bytes_total', 'Callback response bytes sent after compression.')
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def phase(self, name):
+        """Time a phase of the callback running on this thread"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases = getattr(self._local, 'phases', None)
+            if phases is not None:
+                phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+    def wrap(self, name, func):
+        """Wrap a registered callback to record its timings"""
+        @wraps(func)
+        def instrumented(*args, **kwargs):
+            self._local.phases = {}
+            start = time.perf_counter()
+            try:
+                response = func(*args, **kwargs)
+            except Exception:
+                self.count_error(name)
+                raise
+            finally:
+                phases, self._local.phases = self._local.phases, None
+            self.record(name, time.perf_counter() - start, phases, response, args)
+            return response
+        return instrumented
+
+    def record(self, name, elapsed, phases, response, args):
+        phases['overhead'] = max(elapsed - sum(phases.values()), 0.0)
+        # Dash returns the serialized JSON response
+        payload_bytes = len(response) if isinstance(response, (str, bytes)) else 0
+        with self._lock:
+            self.duration.observe(elapsed, callback=name)
+            for phase_name, seconds in phases.items():
+                self.phases.observe(seconds, callback=name, phase=phase_name)
+            self.payload.observe(payload_bytes, callback=name)
+            if elapsed * 1000 >= self.slow_ms:
+                self.slow.inc(callback=name)
+        if elapsed * 1000 >= self.slow_ms and random.random() < self.slow_sample_rate:
+            timings = ', '.join(f'{k} {v * 1000:.1f} ms' for k, v in phases.items())
+            print(f"Slow callback {name}: {elapsed * 1000:.1f} ms ({timings}), "
+                  f"{payload_bytes} bytes, inputs {str(args)[:200]}")
+
+    def count_error(self, name):
+        with self._lock:
+            self.errors.inc(callback=name)
+
+    def count_cache_lookup(self, name, hit):
+        with self._lock:
+            self.cache_lookups.inc(callback=name, result='hit' if hit else 'miss')
+
+    def count_compression(self, encoding, uncompressed, sent):
+        with self._lock:
+            self.uncompressed_bytes.inc(uncompressed, encoding=encoding)
+            self.sent_bytes.inc(sent, encoding=encoding)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.duration, self.phases, self.payload, self.errors, self.slow,
+                           self.cache_lookups, self.uncompressed_bytes, self.sent_bytes):
+                lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+_callback_metrics = CallbackMetrics()
+
+
+def get_callback_metrics():
+    """Get the process-wide callback metrics"""
+    return _callback_metrics
+
+
+def phase(name):
+    """Time a phase of the current callback, e.g. with phase('query'): ..."""
+    return _callback_metrics.phase(name)
+
+
+def count_error(callback):
+    """Count an error a callback handled itself instead of raising"""
+    _callback_metrics.count_error(callback)
+
+
+def count_cache_lookup(callback, hit):
+    """Count a lookup of a memoized callback output"""
+    _callback_metrics.count_cache_lookup(callback, hit)
+
+
+def count_compression(encoding, uncompressed, sent):
+    """Count the bytes of a callback response before and after compression"""
+    _callback_metrics.count_compression(encoding, uncompressed, sent)
+
+
+def instrument_callbacks(app, metrics=None):
+    """Wrap every callback registered on app and expose /metrics"""
+    metrics = metrics or _callback_metrics
+    for entry in app.callback_map.values():
+        # clientside callbacks run in the browser
+        if 'callback' not in entry:
+            continue
+        func = entry['callback']
+        name = getattr(func, '__wrapped__', func).__name__
+        entry['callback'] = metrics.wrap(name, func)
+
+    @app.server.route('/metrics')
+    def callback_metrics():
+        return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
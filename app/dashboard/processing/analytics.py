@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config.settings import Config
+
+# ECB reference rates are published on TARGET business days, about 255 a year
+DAYS_PER_YEAR = 255
+
+
+def trailing_sums(values, window):
+    """Sum and count of the published values in the trailing window of every row
+
+    values is a date x currency array with NaN for missing rates. Windows
+    are `window` rows long (shorter at the start) and are all answered from
+    one running sum per currency.
+    """
+    cum_sum = np.zeros((len(values) + 1, values.shape[1]))
+    cum_count = np.zeros((len(values) + 1, values.shape[1]), dtype=np.int64)
+    np.nancumsum(values, axis=0, out=cum_sum[1:])
+    np.cumsum(~np.isnan(values), axis=0, out=cum_count[1:])
+    hi = np.arange(1, len(values) + 1)
+    lo = np.maximum(hi - window, 0)
+    return cum_sum[hi] - cum_sum[lo], cum_count[hi] - cum_count[lo]
+
+
+def rolling_mean_std(values, window, min_periods=2):
+    """Trailing mean and sample standard deviation per row and currency
+
+    Rates are centered on their column mean first, so the running sum of
+    squares does not lose the variance of large rates to rounding.
+    """
+    published = (~np.isnan(values)).sum(axis=0)
+    center = np.nansum(values, axis=0) / np.maximum(published, 1)
+    centered = values - center
+    total, count = trailing_sums(centered, window)
+    squares, _ = trailing_sums(centered ** 2, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        var = np.maximum(squares - total * mean, 0.0) / (count - 1)
+    too_few = count < min_periods
+    mean[too_few] = np.nan
+    var[too_few] = np.nan
+    return mean + center, np.sqrt(var)
+
+
+def log_returns(values):
+    """Daily log returns, NaN where either day has no rate; the first row is NaN"""
+    returns = np.full(values.shape, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = np.diff(np.log(values), axis=0)
+    return returns
+
+
+def rolling_volatility(values, window=DAYS_PER_YEAR):
+    """Annualized standard deviation of the daily log returns over trailing windows"""
+    _, std = rolling_mean_std(log_returns(values), window)
+    return std * np.sqrt(DAYS_PER_YEAR)
+
+
+def max_drawdown(values, window=None):
+    """Largest fall from a running peak over the last `window` rows, as a fraction
+
+    Returns a negative number (or 0) per currency, NaN without rates.
+    """
+    if window is not None:
+        values = values[-window:]
+    # fmax/fmin skip NaN, so missing days neither set nor break a peak
+    peak = np.fmax.accumulate(values, axis=0)
+    with np.errstate(invalid='ignore'):
+        return np.fmin.reduce(values / peak - 1, axis=0)
+
+
+def latest_rows(values):
+    """Index of the last published rate per currency, -1 if there is none"""
+    published = ~np.isnan(values[::-1])
+    return np.where(published.any(axis=0), len(values) - 1 - published.argmax(axis=0), -1)
+
+
+def percentile_of_latest(values):
+    """Share of the history (0-100) below each currency's latest rate
+
+    Ties count half, so a rate equal to every other one sits at 50.
+    """
+    rows = latest_rows(values)
+    latest = values[rows, np.arange(values.shape[1])]
+    latest[rows < 0] = np.nan
+    with np.errstate(invalid='ignore'):
+        below = (values < latest).sum(axis=0)
+        equal = (values == latest).sum(axis=0)
+        return (below + 0.5 * equal) / (~np.isnan(values)).sum(axis=0) * 100
+
+
+def summarize(matrix, window=DAYS_PER_YEAR):
+    """Where every currency's latest rate stands against its history
+
+    Computed for all currencies of the matrix at once. Per currency code:
+    - percentile: share of the full history below the latest rate
+    - z_score: latest rate against the mean and std of the last `window` rows
+    - volatility: annualized volatility of the log returns over `window` rows
+    - max_drawdown: largest fall from a peak over the last `window` rows
+    Values that cannot be computed are None.
+    """
+    values = matrix.values
+    rows = latest_rows(values)
+    columns = np.arange(values.shape[1])
+    mean, std = rolling_mean_std(values, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z_score = (values[rows, columns] - mean[rows, columns]) / std[rows, columns]
+    stats = {
+        'percentile': percentile_of_latest(values),
+        'z_score': z_score,
+        'volatility': rolling_volatility(values, window)[rows, columns],
+        'max_drawdown': max_drawdown(values, window),
+    }
+    summary = {}
+    for i, code in enumerate(matrix.codes):
+        summary[code] = {
+            name: float(stat[i]) if rows[i] >= 0 and np.isfinite(stat[i]) else None
+            for name, stat in stats.items()
+        }
+    return summary
+
+
+class AnalyticsCache:
+    """Summaries memoized per data version and base currency
+
+    A summary covers every currency of its matrix, so it is computed once
+    per data version and base and reused by every later request.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries if max_entries is not None else Config.CROSS_RATE_CACHE_SIZE
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, matrix):
+        """Get the summary of the matrix, computing it on first use"""
+        key = (matrix.version, matrix.base)
+        with self._lock:
+            if key in self._summaries:
+                self._summaries.move_to_end(key)
+                return self._summaries[key]
+        summary = summarize(matrix)
+        with self._lock:
+            self._summaries[key] = summary
+            while len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+        return summary
@@ -0,0 +1,62 @@
+import base64
+
+import numpy as np
+
+# rates are sent as integers in units of the stored precision (4 decimals)
+RATE_SCALE = 10_000
+# cross rates can be far below 1, so small series keep this many digits instead
+SIGNIFICANT_DIGITS = 5
+# marks a date without a published rate
+MISSING = np.iinfo(np.int32).min
+
+
+def encode_array(values, dtype):
+    """Base64 of the little-endian bytes of values, decoded by typed arrays in the browser"""
+    return base64.b64encode(np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))).decode('ascii')
+
+
+def series_scale(rates):
+    """Power of ten to scale a series of rates by before rounding to int32
+
+    At least RATE_SCALE, and larger for series of small (cross) rates so
+    they keep SIGNIFICANT_DIGITS digits, as long as the largest rate still
+    fits an int32.
+    """
+    peak = np.nanmax(np.abs(rates), initial=0.0)
+    if not peak > 0:
+        return RATE_SCALE
+    decimals = max(int(np.log10(RATE_SCALE)), SIGNIFICANT_DIGITS - 1 - int(np.floor(np.log10(peak))))
+    decimals = min(decimals, int(np.floor(np.log10(np.iinfo(np.int32).max / peak))))
+    return 10 ** decimals
+
+
+def encode_chart_data(df, max_points, layout):
+    """Encode a long dataframe of rates for the clientside chart
+
+    Dates become one shared int32 axis of days since 1970-01-01 and every
+    currency an int32 series of rates scaled by its series_scale, so a series
+    costs 4 bytes (plus base64 overhead) per date instead of a JSON date
+    string and decimal. The browser slices and downsamples the series to
+    max_points per currency and draws them with the given figure layout.
+    """
+    wide = df.pivot(index='conversion_date', columns='currency_code',
+                    values='conversion_rate').sort_index()
+    days = np.asarray(wide.index, dtype='datetime64[D]').astype(np.int32)
+    series = {}
+    scales = {}
+    for code in wide.columns:
+        rates = wide[code].to_numpy(dtype=np.float64)
+        scales[code] = series_scale(rates)
+        scaled = np.full(len(rates), MISSING, dtype=np.int32)
+        published = ~np.isnan(rates)
+        scaled[published] = np.round(rates[published] * scales[code])
+        series[code] = encode_array(scaled, np.int32)
+    return {
+        'dates': encode_array(days, np.int32),
+        'codes': list(wide.columns),
+        'series': series,
+        'scales': scales,
+        'missing': int(MISSING),
+        'max_points': max_points,
+        'layout': layout
+    }
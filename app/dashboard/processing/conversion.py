@@ -0,0 +1,164 @@
+"""Batch conversion of foreign currency amounts at the last published rate
+
+Example, from app/dashboard:
+    python -m processing.conversion transactions.csv converted.csv --max-age-days 7
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from config.settings import Config
+
+# bytes of an input file parsed per chunk
+CHUNK_BYTES = 64 * 1024 * 1024
+
+
+class AsOfConverter:
+    """Converts amounts to the matrix's base currency at the rate in force on each date
+
+    The ECB publishes no rates on weekends and TARGET holidays, so a date
+    uses the last rate published on or before it. The as-of rates are laid
+    out once as a date x currency table (each currency's rates forward
+    filled over the shared sorted date index), so a batch is converted with
+    one searchsorted over the dates and one gather, whatever its mix of
+    currencies. Amounts in the base currency are returned unchanged.
+    Amounts without a rate (unknown currency, a date before the currency's
+    first rate, or a rate older than max_age_days) convert to NaN.
+    """
+
+    def __init__(self, matrix, max_age_days=None):
+        self.base = matrix.base
+        self.max_age_days = max_age_days
+        self.days = matrix.dates.astype(np.int64)
+        self.codes = list(matrix.codes)
+        n_dates, n_codes = matrix.values.shape
+        # row of the last published rate on or before every row, -1 before the first
+        rows = np.where(~np.isnan(matrix.values), np.arange(n_dates)[:, None], -1)
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        # extra columns: the base currency, then NaN for unknown currencies
+        self.rates = np.full((n_dates, n_codes + 2), np.nan)
+        self.rates[:, :n_codes] = np.take_along_axis(matrix.values, np.maximum(rows, 0), axis=0)
+        self.rates[:, :n_codes][rows < 0] = np.nan
+        self.rates[:, n_codes] = 1.0
+        self.rate_days = np.empty((n_dates, n_codes + 2), dtype=np.int64)
+        self.rate_days[:, :n_codes] = self.days[np.maximum(rows, 0)]
+        self.rate_days[:, n_codes:] = self.days[:, None]
+        self._columns = {code: i for i, code in enumerate(self.codes)}
+        self._columns[self.base] = n_codes
+        self._unknown = n_codes + 1
+
+    def columns(self, currencies):
+        """Column of every currency code in the rate table"""
+        if isinstance(currencies, pa.ChunkedArray):
+            currencies = currencies.combine_chunks()
+        if isinstance(currencies, pa.Array):
+            if not pa.types.is_dictionary(currencies.type):
+                currencies = pc.dictionary_encode(currencies)
+            indices = currencies.indices.fill_null(-1).to_numpy()
+            uniques = currencies.dictionary.to_pylist()
+        else:
+            # factorize hashes the codes; only the few distinct ones are looked up
+            indices, uniques = pd.factorize(np.asarray(currencies, dtype=object))
+        lookup = np.array([self._columns.get(code, self._unknown) for code in uniques] + [self._unknown],
+                          dtype=np.int64)
+        # -1 (missing code) picks the trailing unknown entry
+        return lookup[indices]
+
+    def lookup(self, dates, currencies):
+        """As-of rate and the date it was published for every (date, currency)"""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        days = dates.astype(np.int64)
+        rows = np.searchsorted(self.days, days, side='right') - 1
+        columns = self.columns(currencies)
+        before_history = rows < 0
+        flat = np.maximum(rows, 0) * self.rates.shape[1] + columns
+        rates = self.rates.ravel().take(flat)
+        rate_days = self.rate_days.ravel().take(flat)
+        # base currency amounts need no rate, whatever the date
+        is_base = columns == self._columns[self.base]
+        rate_days[is_base] = days[is_base]
+        rates[(before_history & ~is_base) | np.isnat(dates)] = np.nan
+        if self.max_age_days is not None:
+            rates[days - rate_days > self.max_age_days] = np.nan
+        return rates, rate_days.astype('datetime64[D]')
+
+    def convert(self, dates, currencies, amounts):
+        """Amounts in the base currency, one vectorized pass over the batch"""
+        rates, _ = self.lookup(dates, currencies)
+        return np.asarray(amounts, dtype=np.float64) / rates
+
+
+def convert_file(converter, input_path, output_path, date_column='date', currency_column='currency',
+                 amount_column='amount', block_size=CHUNK_BYTES):
+    """Stream a CSV file of transactions through the converter in chunks
+
+    Adds the converted amount (amount_<base>) and the date of the rate used
+    (rate_date) to every row. Memory use is bounded by the chunk size, not
+    the file size. Returns (rows, rows without a rate).
+    """
+    read_options = pa_csv.ReadOptions(block_size=block_size)
+    convert_options = pa_csv.ConvertOptions(column_types={
+        date_column: pa.date32(),
+        currency_column: pa.dictionary(pa.int32(), pa.string()),
+        amount_column: pa.float64()
+    })
+    reader = pa_csv.open_csv(input_path, read_options=read_options, convert_options=convert_options)
+    converted_name = f'amount_{converter.base.lower()}'
+    schema = reader.schema.append(pa.field(converted_name, pa.float64())).append(pa.field('rate_date', pa.date32()))
+    rows = missing = 0
+    with pa_csv.CSVWriter(output_path, schema) as writer:
+        for batch in reader:
+            dates = batch.column(date_column).to_numpy(zero_copy_only=False)
+            amounts = batch.column(amount_column).to_numpy(zero_copy_only=False)
+            rates, rate_dates = converter.lookup(dates, batch.column(currency_column))
+            converted = amounts / rates
+            no_rate = np.isnan(rates)
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                batch.columns + [pa.array(converted, mask=no_rate), pa.array(rate_dates, mask=no_rate)],
+                schema=schema))
+            rows += batch.num_rows
+            missing += int(no_rate.sum())
+    return rows, missing
+
+
+def load_matrix():
+    """Load the stored rate history, as the dashboard's rate cache does"""
+    from database.db_manager import get_db_manager
+    from database.rate_cache import RateCache
+
+    matrix = RateCache().load(get_db_manager().get_engine())
+    if matrix is None:
+        raise RuntimeError("No conversion rates could be loaded")
+    if not matrix.complete:
+        print(f"Warning: only rates since {matrix.dates[0]} fit RATE_CACHE_MAX_MB={Config.RATE_CACHE_MAX_MB}; "
+              f"older transactions are not converted")
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help='CSV file of transactions')
+    parser.add_argument('output', help='CSV file to write the converted transactions to')
+    parser.add_argument('--date-column', default='date')
+    parser.add_argument('--currency-column', default='currency')
+    parser.add_argument('--amount-column', default='amount')
+    parser.add_argument('--max-age-days', type=int, default=None,
+                        help='leave amounts unconverted when the last rate is older than this')
+    args = parser.parse_args()
+
+    converter = AsOfConverter(load_matrix(), args.max_age_days)
+    start = time.perf_counter()
+    rows, missing = convert_file(converter, args.input, args.output, args.date_column,
+                                 args.currency_column, args.amount_column)
+    elapsed = time.perf_counter() - start
+    print(f"Converted {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s), "
+          f"{missing} without a rate")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+
+def min_max_indices(y, n_buckets):
+    """Indices of the min and max point in each of n_buckets equal buckets
+
+    Keeps every visual extreme: drawing one bucket per pixel column renders
+    the same envelope as the raw series. The first and last points are kept.
+    """
+    n = len(y)
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    pad = n_buckets * size - n
+    lows = np.concatenate([y, np.full(pad, np.inf)]).reshape(n_buckets, size)
+    highs = np.concatenate([y, np.full(pad, -np.inf)]).reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    indices = np.concatenate([
+        [0, n - 1],
+        offsets + lows.argmin(axis=1),
+        offsets + highs.argmax(axis=1)
+    ])
+    return np.unique(indices)
+
+
+def lttb_indices(x, y, n_out):
+    """Indices selected by Largest-Triangle-Three-Buckets downsampling
+
+    Picks, per bucket, the point forming the largest triangle with the point
+    picked in the previous bucket and the average of the next bucket.
+    """
+    n = len(y)
+    x = x.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[hi:next_hi].mean() if next_hi > hi else x[-1]
+        next_y = y[hi:next_hi].mean() if next_hi > hi else y[-1]
+        areas = np.abs(
+            (x[prev] - next_x) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (next_y - y[prev])
+        )
+        prev = lo + int(areas.argmax())
+        indices[i + 1] = prev
+    return indices
+
+
+def downsample_frame(df, max_points, method='minmax'):
+    """Downsample each currency of a long rate dataframe to about max_points
+
+    Series that already fit are returned unchanged, so short date ranges
+    keep their raw daily data.
+    """
+    frames = []
+    for _, df_currency in df.groupby('currency_code', sort=False):
+        if len(df_currency) <= max_points:
+            frames.append(df_currency)
+            continue
+        y = df_currency['conversion_rate'].to_numpy(dtype=np.float64)
+        if method == 'lttb':
+            x = df_currency['conversion_date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+            indices = lttb_indices(x, y, max_points)
+        else:
+            # a min and a max per bucket
+            indices = min_max_indices(y, max_points // 2)
+        frames.append(df_currency.iloc[indices])
+    if not frames:
+        return df
+    return pd.concat(frames, ignore_index=True)
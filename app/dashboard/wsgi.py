@@ -0,0 +1,14 @@
+"""WSGI entry point for production servers, e.g. gunicorn -c gunicorn.conf.py wsgi:server
+
+The app is created at import time; with preload_app the master builds the
+layout and loads the rate cache once and the forked workers share them. In
+FAST_STARTUP mode that work is left to each worker (see gunicorn.conf.py).
+"""
+from app import create_app, import_timer
+from config.settings import Config
+
+app = create_app(Config())
+server = app.server
+
+if import_timer is not None:
+    import_timer.report()
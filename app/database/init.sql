@@ -1,8 +1,58 @@
-CREATE TABLE IF NOT EXISTS conversion_rates (
-    conversion_date DATE,
-    currency_code VARCHAR(3),
-    conversion_rate DECIMAL(50, 4),
-    PRIMARY KEY (conversion_date, currency_code)
+-- Currency codes, referenced by a 2-byte id instead of repeating the code
+CREATE TABLE IF NOT EXISTS currencies (
+    currency_id SMALLINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    currency_code VARCHAR(3) NOT NULL UNIQUE
 );
 
-CREATE INDEX IF NOT EXISTS idx_currency_timestamp ON conversion_rates(currency_code, conversion_date);
\ No newline at end of file
+-- One B-tree serves both the per-currency date range reads of the dashboard
+-- (index-only, as it includes the rate) and the upload job's conflict check.
+-- Rows arrive in date order, so a BRIN index answers date-only filters
+-- across all currencies at a fraction of a B-tree's size.
+CREATE TABLE IF NOT EXISTS rates (
+    currency_id SMALLINT NOT NULL REFERENCES currencies (currency_id),
+    conversion_date DATE NOT NULL,
+    conversion_rate DOUBLE PRECISION,
+    PRIMARY KEY (currency_id, conversion_date) INCLUDE (conversion_rate)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rates_conversion_date_brin ON rates USING brin (conversion_date);
+
+-- Readers keep querying conversion_rates by currency code
+CREATE OR REPLACE VIEW conversion_rates AS
+SELECT r.conversion_date, c.currency_code, r.conversion_rate
+FROM rates r
+JOIN currencies c USING (currency_id);
+
+-- Running sums per currency, so the mean rate over any [a, b] window is
+-- (sum(b) - sum(a - 1)) / (count(b) - count(a - 1)). Maintained by the upload job.
+CREATE TABLE IF NOT EXISTS conversion_rate_sums (
+    currency_id SMALLINT NOT NULL REFERENCES currencies (currency_id),
+    conversion_date DATE NOT NULL,
+    rate_sum DOUBLE PRECISION,
+    rate_count INTEGER,
+    PRIMARY KEY (currency_id, conversion_date)
+);
+
+-- Weekly and monthly OHLC rollups per currency, maintained incrementally by
+-- the upload job (refresh_rate_rollups.sql). Long chart ranges read one row
+-- per period instead of one per day. The mean is rate_sum / rate_count, so
+-- rollups of finer sources (e.g. intraday) combine exactly.
+CREATE TABLE IF NOT EXISTS rate_rollups (
+    resolution VARCHAR(5) NOT NULL,
+    currency_id SMALLINT NOT NULL REFERENCES currencies (currency_id),
+    period_start DATE NOT NULL,
+    open_rate DOUBLE PRECISION,
+    high_rate DOUBLE PRECISION,
+    low_rate DOUBLE PRECISION,
+    close_rate DOUBLE PRECISION,
+    rate_sum DOUBLE PRECISION,
+    rate_count INTEGER,
+    PRIMARY KEY (resolution, currency_id, period_start)
+);
+
+CREATE OR REPLACE VIEW conversion_rate_rollups AS
+SELECT r.resolution, r.period_start, c.currency_code,
+       r.open_rate, r.high_rate, r.low_rate, r.close_rate,
+       r.rate_sum / r.rate_count AS mean_rate, r.rate_count
+FROM rate_rollups r
+JOIN currencies c USING (currency_id);
@@ -0,0 +1,52 @@
+-- Migrate a database created by an earlier init.sql to the compact layout:
+--   conversion_rates (DATE, VARCHAR(3), DECIMAL(50, 4)) with a primary key
+--   and a second index on the same columns
+-- becomes
+--   currencies (SMALLINT id, code), rates (SMALLINT, DATE, DOUBLE PRECISION)
+--   with one covering primary key and a BRIN index on the date,
+--   plus a conversion_rates view with the old columns for readers.
+--
+-- Run once, with the upload job stopped:
+--   psql -v ON_ERROR_STOP=1 -f 001_compact_conversion_rates.sql
+-- The old table is kept as conversion_rates_legacy; drop it once verified.
+
+BEGIN;
+
+CREATE TABLE currencies (
+    currency_id SMALLINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    currency_code VARCHAR(3) NOT NULL UNIQUE
+);
+
+CREATE TABLE rates (
+    currency_id SMALLINT NOT NULL REFERENCES currencies (currency_id),
+    conversion_date DATE NOT NULL,
+    conversion_rate DOUBLE PRECISION
+);
+
+INSERT INTO currencies (currency_code)
+SELECT DISTINCT currency_code
+FROM conversion_rates
+ORDER BY currency_code;
+
+-- load in index order and build the indexes afterwards
+INSERT INTO rates (currency_id, conversion_date, conversion_rate)
+SELECT c.currency_id, r.conversion_date, r.conversion_rate::float8
+FROM conversion_rates r
+JOIN currencies c USING (currency_code)
+ORDER BY r.conversion_date, c.currency_id;
+
+ALTER TABLE rates ADD PRIMARY KEY (currency_id, conversion_date) INCLUDE (conversion_rate);
+CREATE INDEX idx_rates_conversion_date_brin ON rates USING brin (conversion_date);
+
+ALTER TABLE conversion_rates RENAME TO conversion_rates_legacy;
+ALTER INDEX IF EXISTS idx_currency_timestamp RENAME TO idx_currency_timestamp_legacy;
+
+CREATE VIEW conversion_rates AS
+SELECT r.conversion_date, c.currency_code, r.conversion_rate
+FROM rates r
+JOIN currencies c USING (currency_id);
+
+COMMIT;
+
+ANALYZE currencies;
+ANALYZE rates;
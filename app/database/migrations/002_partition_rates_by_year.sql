@@ -0,0 +1,57 @@
+-- Optional: range-partition rates by year, after 001_compact_conversion_rates.sql.
+--
+-- Worth it once the history is large enough that date-bounded scans and
+-- maintenance (VACUUM, reindexing) benefit from touching only recent years;
+-- at the ECB's ~10k rows a year a single table with the BRIN index is
+-- usually as fast. Measure with benchmarks/bench_storage_layout.py first.
+--
+-- Run once, with the upload job stopped:
+--   psql -v ON_ERROR_STOP=1 -f 002_partition_rates_by_year.sql
+-- Years after the current one land in rates_default until a partition for
+-- them is created (and the rows moved) with the same statement as below.
+
+BEGIN;
+
+ALTER TABLE rates RENAME TO rates_unpartitioned;
+ALTER TABLE rates_unpartitioned RENAME CONSTRAINT rates_pkey TO rates_unpartitioned_pkey;
+ALTER INDEX idx_rates_conversion_date_brin RENAME TO idx_rates_unpartitioned_conversion_date_brin;
+
+CREATE TABLE rates (
+    currency_id SMALLINT NOT NULL REFERENCES currencies (currency_id),
+    conversion_date DATE NOT NULL,
+    conversion_rate DOUBLE PRECISION,
+    PRIMARY KEY (currency_id, conversion_date) INCLUDE (conversion_rate)
+) PARTITION BY RANGE (conversion_date);
+
+DO $$
+DECLARE
+    first_year INTEGER;
+BEGIN
+    SELECT COALESCE(EXTRACT(YEAR FROM MIN(conversion_date)), EXTRACT(YEAR FROM CURRENT_DATE))::integer
+    INTO first_year FROM rates_unpartitioned;
+    FOR year IN first_year .. EXTRACT(YEAR FROM CURRENT_DATE)::integer LOOP
+        EXECUTE format(
+            'CREATE TABLE rates_%s PARTITION OF rates FOR VALUES FROM (%L) TO (%L)',
+            year, make_date(year, 1, 1), make_date(year + 1, 1, 1));
+    END LOOP;
+END $$;
+
+CREATE TABLE rates_default PARTITION OF rates DEFAULT;
+CREATE INDEX idx_rates_conversion_date_brin ON rates USING brin (conversion_date);
+
+INSERT INTO rates (currency_id, conversion_date, conversion_rate)
+SELECT currency_id, conversion_date, conversion_rate
+FROM rates_unpartitioned
+ORDER BY conversion_date, currency_id;
+
+-- the view is bound to the old table; point it at the partitioned one
+CREATE OR REPLACE VIEW conversion_rates AS
+SELECT r.conversion_date, c.currency_code, r.conversion_rate
+FROM rates r
+JOIN currencies c USING (currency_id);
+
+DROP TABLE rates_unpartitioned;
+
+COMMIT;
+
+ANALYZE rates;
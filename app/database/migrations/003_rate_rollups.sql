@@ -0,0 +1,52 @@
+-- Add the weekly and monthly rollups to a database created before init.sql
+-- had them, after 001_compact_conversion_rates.sql, and fill them from the
+-- stored history. The upload job keeps them up to date from then on.
+--
+-- Run once:
+--   psql -v ON_ERROR_STOP=1 -f 003_rate_rollups.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS rate_rollups (
+    resolution VARCHAR(5) NOT NULL,
+    currency_id SMALLINT NOT NULL REFERENCES currencies (currency_id),
+    period_start DATE NOT NULL,
+    open_rate DOUBLE PRECISION,
+    high_rate DOUBLE PRECISION,
+    low_rate DOUBLE PRECISION,
+    close_rate DOUBLE PRECISION,
+    rate_sum DOUBLE PRECISION,
+    rate_count INTEGER,
+    PRIMARY KEY (resolution, currency_id, period_start)
+);
+
+CREATE OR REPLACE VIEW conversion_rate_rollups AS
+SELECT r.resolution, r.period_start, c.currency_code,
+       r.open_rate, r.high_rate, r.low_rate, r.close_rate,
+       r.rate_sum / r.rate_count AS mean_rate, r.rate_count
+FROM rate_rollups r
+JOIN currencies c USING (currency_id);
+
+DELETE FROM rate_rollups;
+
+INSERT INTO rate_rollups (resolution, currency_id, period_start,
+                          open_rate, high_rate, low_rate, close_rate, rate_sum, rate_count)
+SELECT
+    res.resolution,
+    r.currency_id,
+    date_trunc(res.resolution, r.conversion_date)::date,
+    (array_agg(r.conversion_rate ORDER BY r.conversion_date))[1],
+    MAX(r.conversion_rate),
+    MIN(r.conversion_rate),
+    (array_agg(r.conversion_rate ORDER BY r.conversion_date DESC))[1],
+    SUM(r.conversion_rate),
+    COUNT(*)
+FROM
+    rates r
+    CROSS JOIN (VALUES ('week'), ('month')) AS res(resolution)
+WHERE r.conversion_rate IS NOT NULL
+GROUP BY 1, 2, 3;
+
+COMMIT;
+
+ANALYZE rate_rollups;
@@ -0,0 +1,35 @@
+-- Create the running sums of a database created before init.sql had them, or
+-- re-key sums made by an earlier init.sql (by currency_code, as DECIMAL) by
+-- the SMALLINT currency id, as rates is. Run after
+-- 001_compact_conversion_rates.sql. The sums are rebuilt from the stored
+-- history; the upload job keeps them up to date from then on.
+--
+-- Run once, with the upload job stopped:
+--   psql -v ON_ERROR_STOP=1 -f 004_rate_sums_by_currency_id.sql
+
+BEGIN;
+
+DROP TABLE IF EXISTS conversion_rate_sums;
+
+-- Running sums per currency, so the mean rate over any [a, b] window is
+-- (sum(b) - sum(a - 1)) / (count(b) - count(a - 1)). Maintained by the upload job.
+CREATE TABLE IF NOT EXISTS conversion_rate_sums (
+    currency_id SMALLINT NOT NULL REFERENCES currencies (currency_id),
+    conversion_date DATE NOT NULL,
+    rate_sum DOUBLE PRECISION,
+    rate_count INTEGER,
+    PRIMARY KEY (currency_id, conversion_date)
+);
+
+INSERT INTO conversion_rate_sums (currency_id, conversion_date, rate_sum, rate_count)
+SELECT
+    currency_id,
+    conversion_date,
+    SUM(conversion_rate) OVER w,
+    COUNT(*) OVER w
+FROM rates
+WINDOW w AS (PARTITION BY currency_id ORDER BY conversion_date);
+
+COMMIT;
+
+ANALYZE conversion_rate_sums;
@@ -1,13 +1,22 @@
-from datetime import datetime
+import io
 import os
+import queue
+import threading
+import numpy as np
 import pandas as pd
-import psycopg2
+import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from sqlalchemy import create_engine
 
-from scraper import download_csv
+from db import (
+    ROLLUP_RESOLUTIONS, STALE_DAYS, catch_up_aggregates, get_db_connection, get_db_params,
+    notify_data_version, test_connection)
+from scraper import ECB_FILES, OUTFILE, choose_file, download_csv, save_fetch_state
+from snapshot import SNAPSHOT_DIR, has_snapshot, publish_snapshot
 
 # get directory of this file
 DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,15 +24,14 @@ DIR = os.path.dirname(os.path.abspath(__file__))
 # Load environment variables
 load_dotenv()
 
-def get_db_connection():
-    '''Create database connection'''
-    return psycopg2.connect(
-        host=os.getenv('POSTGRES_HOST', 'postgres'),
-        port=os.getenv('POSTGRES_PORT', '5432'),
-        database=os.getenv('POSTGRES_DB', 'currency_tracker'),
-        user=os.getenv('POSTGRES_USER', 'postgres'),
-        password=os.getenv('POSTGRES_PASSWORD', 'password')
-    )
+# compare the whole file against the database to fill holes in the history
+BACKFILL = os.getenv('UPLOAD_BACKFILL', 'false').lower() == 'true'
+# connections loading rows in parallel
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '4'))
+# parsed chunks waiting for the loader
+UPLOAD_QUEUE_SIZE = int(os.getenv('UPLOAD_QUEUE_SIZE', '4'))
+# smaller chunks are loaded over one connection instead of split by currency
+PARALLEL_MIN_ROWS = 10000
 
 def get_db_engine():
     '''Create database engine'''
@@ -36,106 +44,497 @@ def get_db_engine():
         f'postgresql://{usr}:{pwd}@{host}:{port}/{db}'
     )
 
-def test_connection():
-    '''Test PostgreSQL connection'''
-    for _ in range(10):
-        try:
-            conn = get_db_connection()
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute('SELECT version();')
-                version = cur.fetchone()
-                print(f'Connected to PostgreSQL: {version['version']}')
-                
-                # Test table access
-                cur.execute('SELECT COUNT(*) FROM conversion_rates;')
-                count = cur.fetchone()
-                print(f'Found {count['count']} records in conversion_rates table')
-                
-            conn.close()
-            return True
-        except psycopg2.OperationalError as e:
-            print("Database not ready, retrying...")
-            time.sleep(3)
-    print(f'Database connection failed: {e}')
-    return False
+def to_days(dates) -> np.ndarray:
+    '''Convert dates to int32 day numbers since 1970-01-01'''
+    return pd.to_datetime(dates).values.astype('datetime64[D]').astype(np.int32)
+
+def from_days(days) -> np.ndarray:
+    '''Convert int32 day numbers back to datetime64 dates'''
+    return np.asarray(days).astype('datetime64[D]')
 
 def get_last_update_per_currency(query_file) -> pd.DataFrame:
     '''Get the latest dates for each currency'''
     with open(query_file, 'r') as f:
         query = f.read()
     # loads to a dataframe with currency code and latest date
-    df = pd.read_sql_query(query, get_db_connection())
+    conn = get_db_connection()
+    try:
+        df = pd.read_sql_query(query, conn)
+    finally:
+        conn.close()
     df['latest_date'] = pd.to_datetime(df['latest_date'])
+    df['latest_day'] = to_days(df['latest_date'])
     return df
 
-def get_latest_rates(csv_file) -> pd.DataFrame:
+def get_file_date(last_update_per_currency):
+    '''Oldest latest date among the currencies still published, NaT if none
+
+    The ECB file is chosen from this date rather than the newest one, so a
+    currency whose rows failed to load while the others committed still
+    finds its gap in the file.
+    '''
+    latest = last_update_per_currency['latest_date']
+    return latest[latest >= latest.max() - pd.Timedelta(days=STALE_DAYS)].min()
+
+def get_parse_cutoffs(last_update_per_currency, currencies) -> np.ndarray:
+    '''Latest loaded day per currency, or None if the database is empty
+
+    Currencies the database has never seen get the minimum int32 so all of
+    their history is read.
+    '''
+    if last_update_per_currency is None or last_update_per_currency.empty:
+        return None
+    latest = last_update_per_currency.set_index('currency_code')['latest_day']
+    return latest.reindex(currencies)\
+        .fillna(np.iinfo(np.int32).min)\
+        .to_numpy(dtype=np.int32)
+
+def iter_latest_rates(csv_file, last_update_per_currency=None, chunksize=250):
+    '''Stream the ECB history file as compact long dataframes
+
+    The file is wide and sorted newest date first. It is read in chunks of
+    dates, starting at chunksize and doubling, and reading stops once every
+    currency still published is past its latest loaded date. Currencies the
+    ECB stopped publishing (CYP, EEK, ...) do not hold the parse back unless
+    the file has rows for them that the database lacks.
+
+    Yields dataframes with columns:
+    - conversion_day: int32 days since 1970-01-01
+    - currency_code: categorical currency code
+    - conversion_rate: float64 rate rounded to 4 decimal places
+    '''
+    header = pd.read_csv(csv_file, nrows=0).columns
+    # the ECB file ends every line with a comma, giving an unnamed column
+    currencies = [c.strip() for c in header
+                  if c.strip() and c != 'Date' and not c.startswith('Unnamed')]
+    codes = pd.CategoricalDtype(currencies)
+    cutoffs = get_parse_cutoffs(last_update_per_currency, currencies)
+    if cutoffs is not None:
+        # currencies updated within a month of the newest are still published
+        active = cutoffs >= cutoffs.max() - STALE_DAYS
+        seen = np.zeros(len(currencies), dtype=bool)
+
+    reader = pd.read_csv(
+        csv_file, usecols=lambda c: c.strip() in currencies or c == 'Date',
+        na_values=['N/A'], dtype={c: np.float64 for c in header if c != 'Date'},
+        iterator=True)
+    # start small for nightly runs and double the chunk size for backfills
+    size = chunksize
+    while True:
+        try:
+            chunk = reader.get_chunk(size)
+        except StopIteration:
+            break
+        size *= 2
+        # ISO dates parse directly into numpy day numbers
+        days = chunk['Date'].to_numpy(dtype='datetime64[D]').astype(np.int32)
+        rates = chunk.drop(columns='Date').to_numpy(dtype=np.float64).round(4)
+        published = ~np.isnan(rates)
+        # flatten the wide chunk row by row into long rows
+        yield pd.DataFrame({
+            'conversion_day': np.repeat(days, len(currencies))[published.ravel()],
+            'currency_code': pd.Categorical.from_codes(
+                np.tile(np.arange(len(currencies), dtype=np.int16), len(days))[published.ravel()],
+                dtype=codes),
+            'conversion_rate': rates[published]
+        })
+        if cutoffs is not None:
+            seen |= published.any(axis=0)
+            pending = (cutoffs < days.min()) & (active | seen)
+            if not pending.any():
+                break
+
+def get_latest_rates(csv_file, last_update_per_currency=None) -> pd.DataFrame:
     '''Load the latest rates into the database
 
     Load the raw datafile downloaded from the ECB website. Original data is in
-    wide format and contains all history since EUR was founded.
+    wide format and contains all history since EUR was founded. When the last
+    update per currency is given, only the newest part of the file is parsed.
 
     Args:
         csv_file: path to the csv file
+        last_update_per_currency: latest loaded date per currency, optional
 
     Returns a dataframe with columns:
-    - conversion_date: date of the conversion rate
-    - currency_code: currency code
+    - conversion_day: int32 days since 1970-01-01
+    - currency_code: categorical currency code
     - conversion_rate: conversion rate
     '''
-    df = pd.read_csv(csv_file)
-    df = df.rename(columns={'Date': 'conversion_date'})
-    df_long = df.melt(id_vars=['conversion_date'], var_name='currency_code',
-                      value_name='conversion_rate')
-    df_long['conversion_date'] = pd.to_datetime(df_long['conversion_date'])
-    # limit rate to 4 decimal places
-    df_long['conversion_rate'] = df_long['conversion_rate']\
-        .astype(float)\
-        .round(4)
-    # drop instances where conversion_rate is NaN
-    df_long = df_long[~df_long['conversion_rate'].isna()]
-    return df_long
-
-def get_missing_dates(last_update_per_currency, latest_rates_df) -> pd.DataFrame:
-    '''Get the missing dates for each currency'''
-    # get earliest date in last_update_per_currency
-    earliest_date = last_update_per_currency['latest_date'].min()
-    # check if earliest_date is NaT
-    if pd.isna(earliest_date):
-        earliest_date = datetime.strptime('1970-01-01', '%Y-%m-%d')
-    # limit latest_rates_df to dates after earliest_date
-    # this avoids expensive join with entire conversion rate history
-    latest_rates_df_lim = latest_rates_df[
-        latest_rates_df['conversion_date'] > earliest_date]
-    # merge the two dataframes on currency code and conversion date
-    merged = pd.merge(
-        last_update_per_currency, latest_rates_df_lim, on='currency_code',
-        how='outer', suffixes=('_last_update', '_latest'))
-    # fill in latest_date with past date in case of new currency code
-    merged['latest_date'] = merged['latest_date']\
-        .fillna(datetime.strptime('1970-01-01', '%Y-%m-%d'))
-    # get entries where latest file date is after latest update date
-    missing_dates = merged[merged['conversion_date'] > merged['latest_date']]
-    # reformat columns
-    missing_dates = missing_dates[
-        ['conversion_date', 'currency_code', 'conversion_rate']]
-    return missing_dates
+    return pd.concat(
+        iter_latest_rates(csv_file, last_update_per_currency), ignore_index=True)
+
+def get_existing_keys() -> pd.DataFrame:
+    '''Get the (currency_code, conversion_day) of every stored rate'''
+    conn = get_db_connection()
+    try:
+        df = pd.read_sql_query(
+            'SELECT currency_code, conversion_date FROM conversion_rates', conn)
+    finally:
+        conn.close()
+    return pd.DataFrame({
+        'currency_code': df['currency_code'],
+        'conversion_day': to_days(df['conversion_date'])
+    })
+
+def get_missing_dates(last_update_per_currency, latest_rates_df, existing_keys=None) -> pd.DataFrame:
+    '''Get the rows of latest_rates_df missing from the database
+
+    By default a row is missing when it is newer than the latest loaded date
+    of its currency. The cutoffs are an array indexed by currency category
+    code, so one lagging or retired currency costs nothing extra.
+
+    With existing_keys (see get_existing_keys) every stored row is compared,
+    which also finds holes in the middle of the history.
+    '''
+    codes = latest_rates_df['currency_code'].cat.codes.to_numpy()
+    days = latest_rates_df['conversion_day'].to_numpy()
+    currencies = latest_rates_df['currency_code'].cat.categories
+    if existing_keys is not None:
+        if latest_rates_df.empty:
+            return latest_rates_df
+        # currency x day grid of stored rates covering the file's date span
+        first_day = days.min()
+        stored = np.zeros((len(currencies), days.max() - first_day + 1), dtype=bool)
+        existing_codes = pd.Categorical(
+            existing_keys['currency_code'], categories=currencies).codes
+        existing_days = existing_keys['conversion_day'].to_numpy() - first_day
+        in_grid = (existing_codes >= 0) & (existing_days >= 0) & (existing_days < stored.shape[1])
+        stored[existing_codes[in_grid], existing_days[in_grid]] = True
+        missing = ~stored[codes, days - first_day]
+    else:
+        cutoffs = get_parse_cutoffs(last_update_per_currency, currencies)
+        if cutoffs is None:
+            return latest_rates_df
+        missing = days > cutoffs[codes]
+    return latest_rates_df[missing]
+
+class CsvStream:
+    '''File-like reader that renders a dataframe as csv one chunk at a time
+
+    Lets COPY consume the rows without building the whole csv text in memory.
+    '''
+
+    def __init__(self, df, chunk_rows=50000, format_chunk=None):
+        self.df = df
+        self.chunk_rows = chunk_rows
+        self.format_chunk = format_chunk
+        self.offset = 0
+        self.buffer = io.StringIO()
+
+    def read(self, size=-1):
+        data = self.buffer.read(size)
+        while not data and self.offset < len(self.df):
+            chunk = self.df.iloc[self.offset:self.offset + self.chunk_rows]
+            if self.format_chunk is not None:
+                chunk = self.format_chunk(chunk)
+            self.buffer = io.StringIO(
+                chunk.to_csv(header=False, index=False, date_format='%Y-%m-%d'))
+            self.offset += self.chunk_rows
+            data = self.buffer.read(size)
+        return data
+
+def to_db_rows(df) -> pd.DataFrame:
+    '''Convert parsed rows to the conversion_rates column layout'''
+    return pd.DataFrame({
+        'conversion_date': from_days(df['conversion_day']),
+        'currency_code': df['currency_code'].astype(str),
+        'conversion_rate': df['conversion_rate']
+    })
+
+def load_rows(conn, rows) -> int:
+    '''Load parsed rows over a psycopg2 connection, returning how many were new
+
+    Rows are streamed with COPY into a temporary staging table and then moved
+    into rates (behind the conversion_rates view), skipping rows that already
+    exist. New currency codes are added to the currencies lookup first.
+    '''
+    with conn.cursor() as cur:
+        cur.execute(
+            'CREATE TEMP TABLE staging_rates '
+            '(LIKE conversion_rates INCLUDING DEFAULTS) ON COMMIT DROP')
+        cur.copy_expert(
+            'COPY staging_rates (conversion_date, currency_code, conversion_rate) '
+            'FROM STDIN WITH (FORMAT csv)',
+            CsvStream(rows, format_chunk=to_db_rows))
+        # conversion_rates is a view over rates and the currencies lookup
+        cur.execute(
+            'INSERT INTO currencies (currency_code) '
+            'SELECT DISTINCT currency_code FROM staging_rates '
+            # a fixed order, so concurrent loads adding codes cannot deadlock
+            'ORDER BY currency_code ON CONFLICT DO NOTHING')
+        cur.execute(
+            'INSERT INTO rates (currency_id, conversion_date, conversion_rate) '
+            'SELECT c.currency_id, s.conversion_date, s.conversion_rate '
+            'FROM staging_rates s JOIN currencies c USING (currency_code) '
+            'ON CONFLICT DO NOTHING')
+        nrows = cur.rowcount
+    conn.commit()
+    return nrows
 
 def insert_missing_dates(missing_dates, eng):
-    '''Insert the missing dates into the database'''
-    # insert missing dates using pandas
-    nrows = missing_dates.to_sql('conversion_rates', eng, if_exists='append', index=False)
-    print(f'Inserted {nrows} rows')
+    '''Insert the missing dates into the database, see load_rows'''
+    start = time.perf_counter()
+    if eng.dialect.name != 'postgresql':
+        # COPY is PostgreSQL only; other engines (e.g. SQLite stand-ins) append
+        nrows = to_db_rows(missing_dates).to_sql(
+            'conversion_rates', eng, if_exists='append', index=False)
+    else:
+        conn = eng.raw_connection()
+        try:
+            nrows = load_rows(conn, missing_dates)
+        finally:
+            conn.close()
+    elapsed = time.perf_counter() - start
+    print(f'Inserted {nrows} rows in {elapsed:.2f}s '
+          f'({len(missing_dates) / max(elapsed, 1e-9):,.0f} rows/sec)')
+    refresh_rate_sums(missing_dates, os.path.join(DIR, 'refresh_rate_sums.sql'), eng)
+    refresh_rate_rollups(missing_dates, os.path.join(DIR, 'refresh_rate_rollups.sql'), eng)
+    return nrows
 
-def main():
+def refresh_rate_sums(missing_dates, query_file, eng):
+    '''Refresh the running sums used for window averages
 
-    download_csv()
-    last_update_per_currency = get_last_update_per_currency(
-        os.path.join(DIR, 'last_update_per_currency.sql'))
-    latest_rates = get_latest_rates(
-        os.path.join(DIR, 'data', 'eurofxref-hist.csv'))
-    missing_dates = get_missing_dates(last_update_per_currency, latest_rates)
-    test_connection() 
-    insert_missing_dates(missing_dates, get_db_engine())
+    Currencies with new rows are recomputed from their earliest new date and
+    the others from their last running total, so the cost follows the size
+    of the update and not the history.
+    '''
+    if refresh_from_dates(missing_dates, query_file, eng):
+        print(f'Refreshed running sums ({missing_dates["currency_code"].nunique()} currencies with new rows)')
+
+def refresh_rate_rollups(missing_dates, query_file, eng):
+    '''Refresh the ROLLUP_RESOLUTIONS rollups from the period of each currency's earliest new date
+
+    Every currency's newest stored period is recomputed too, so rows
+    committed by a run that failed before its refresh are caught up.
+    '''
+    if refresh_from_dates(missing_dates, query_file, eng, resolutions=ROLLUP_RESOLUTIONS):
+        print(f'Refreshed {"/".join(ROLLUP_RESOLUTIONS)} rollups '
+              f'({missing_dates["currency_code"].nunique()} currencies with new rows)')
+
+def refresh_from_dates(missing_dates, query_file, eng, **params):
+    '''Run an incremental refresh query from each currency's earliest new date
+
+    Currencies without new dates are caught up from their stored aggregates
+    (see catch_up_aggregates). Returns False when the engine is not
+    PostgreSQL (e.g. a SQLite stand-in).
+    '''
+    if eng.dialect.name != 'postgresql':
+        return False
+    from_days_per_currency = missing_dates\
+        .groupby('currency_code', observed=True)['conversion_day'].min()
+    with open(query_file, 'r') as f:
+        query = f.read()
+    conn = eng.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(query, {
+                'codes': list(from_days_per_currency.index),
+                'from_dates': list(from_days(from_days_per_currency).astype(object)),
+                **params
+            })
+        conn.commit()
+    finally:
+        conn.close()
+    return True
+
+def notify_dashboard():
+    '''Ask the dashboard over HTTP to reload its rate cache after new rows were inserted
+
+    Only needed for dashboards that do not LISTEN for notify_data_version.
+    '''
+    url = os.getenv('DASHBOARD_INVALIDATE_URL')
+    if not url:
+        return
+    try:
+        resp = requests.post(
+            url, headers={'X-Cache-Token': os.getenv('CACHE_INVALIDATE_TOKEN', '')},
+            timeout=5)
+        resp.raise_for_status()
+        print('Dashboard rate cache invalidated')
+    except requests.RequestException as e:
+        # the dashboard may not be running, e.g. on the first deployment
+        print(f'Could not invalidate dashboard cache: {e}')
+
+class StageTimer:
+    '''Wall-clock spans of pipeline stages, which may overlap and repeat'''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # name -> [first start, last end, summed duration]
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                span = self.spans.setdefault(name, [start, end, 0.0])
+                span[0], span[1] = min(span[0], start), max(span[1], end)
+                span[2] += end - start
+
+    def report(self):
+        print('Stage timings (seconds from start; busy = summed over repeats and threads):')
+        for name, (first, last, busy) in sorted(self.spans.items(), key=lambda item: item[1][0]):
+            print(f'  {name:<14} {first - self.start:7.2f} -> {last - self.start:7.2f}  busy {busy:7.2f}')
+        print(f'  {"total":<14} {time.perf_counter() - self.start:7.2f}')
+
+def split_by_currency(rows, n_parts):
+    '''Split rows into up to n_parts frames with disjoint currencies'''
+    if n_parts <= 1 or len(rows) < PARALLEL_MIN_ROWS:
+        return [rows]
+    part = rows['currency_code'].cat.codes.to_numpy() % n_parts
+    return [rows[part == i] for i in range(n_parts) if (part == i).any()]
+
+def run_pipeline(prefetched=None):
+    '''Download, parse and load with the stages overlapped
+
+    - The database readiness check and last-update query run while the
+      90-day file (which covers a database a few days behind) downloads;
+      the full history is only fetched if the database turns out to need it.
+    - The parser streams chunks into a bounded queue; the loader finds the
+      missing rows of each chunk and loads them while the next is parsed.
+    - Large chunks are split by currency and loaded in parallel over a
+      small connection pool, each part touching disjoint keys.
+
+    prefetched is a download_csv result for the database's latest date, as
+    made by main.py before importing this module; it replaces the
+    speculative download.
+    '''
+    timer = StageTimer()
+    executor = ThreadPoolExecutor(max_workers=3)
+    loaders = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+    pool = None
+    try:
+        def prepare_database():
+            with timer.stage('db_ready'):
+                test_connection()
+            with timer.stage('last_update'):
+                last_update = get_last_update_per_currency(
+                    os.path.join(DIR, 'last_update_per_currency.sql'))
+            existing_keys = None
+            if BACKFILL:
+                with timer.stage('existing_keys'):
+                    existing_keys = get_existing_keys()
+            return last_update, existing_keys
+
+        def download(**kwargs):
+            with timer.stage('download'):
+                return download_csv(**kwargs)
+
+        database_future = executor.submit(prepare_database)
+        if prefetched is None:
+            # a backfill always compares the full history
+            first_file = ECB_FILES[-1][0] if BACKFILL else ECB_FILES[1][0]
+            download_future = executor.submit(download, path=first_file, conditional=not BACKFILL)
+        else:
+            # a failed download has no file and is not retried
+            first_file = prefetched.get('file', ECB_FILES[-1][0])
+        last_update_per_currency, existing_keys = database_future.result()
+        latest_date = get_file_date(last_update_per_currency)
+        # the latest date of the most lagging published currency decides which ECB file is needed
+        needed_file = choose_file(None if BACKFILL or pd.isna(latest_date) else latest_date.date())
+        files = [path for path, _ in ECB_FILES]
+        downloaded = download_future.result() if prefetched is None else prefetched
+        if files.index(needed_file) > files.index(first_file):
+            downloaded = download(latest_date=None)
+        if downloaded['status'] == 'not_modified':
+            print('No new rates published since the last run')
+            catch_up_aggregates()
+            if SNAPSHOT_DIR and not has_snapshot():
+                publish_snapshot(get_db_engine())
+            return
+
+        chunks = queue.Queue(maxsize=UPLOAD_QUEUE_SIZE)
+        # set when the loader gives up, so the parser does not block on a full queue
+        stop = threading.Event()
+
+        def parse():
+            try:
+                # fall back to the bundled history file if the download failed
+                parsed = iter_latest_rates(
+                    downloaded.get('path', os.path.join(DIR, 'data', OUTFILE)),
+                    None if BACKFILL else last_update_per_currency)
+                while not stop.is_set():
+                    with timer.stage('parse'):
+                        chunk = next(parsed, None)
+                    if chunk is None:
+                        break
+                    chunks.put(chunk)
+            finally:
+                if not stop.is_set():
+                    chunks.put(None)
+
+        def load(rows):
+            with timer.stage('load'):
+                conn = pool.getconn()
+                try:
+                    return load_rows(conn, rows)
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    pool.putconn(conn)
+
+        parse_future = executor.submit(parse)
+        loads = []
+        # earliest new day per currency, for the running sums
+        first_new_days = {}
+        try:
+            pool = ThreadedConnectionPool(1, UPLOAD_WORKERS, **get_db_params())
+            while (chunk := chunks.get()) is not None:
+                with timer.stage('detect'):
+                    missing = get_missing_dates(last_update_per_currency, chunk, existing_keys)
+                if missing.empty:
+                    continue
+                first_days = missing.groupby('currency_code', observed=True)['conversion_day'].min()
+                for code, day in first_days.items():
+                    first_new_days[code] = min(day, first_new_days.get(code, day))
+                for rows in split_by_currency(missing, UPLOAD_WORKERS):
+                    loads.append(loaders.submit(load, rows))
+        except BaseException:
+            stop.set()
+            # unblock a parser waiting on the full queue
+            while not parse_future.done():
+                try:
+                    chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            raise
+        parse_future.result()
+        inserted = sum(future.result() for future in loads)
+        print(f'Inserted {inserted} rows')
+
+        eng = get_db_engine()
+        # refreshed even without new rows, to catch up after a failed run
+        new_days = pd.DataFrame({
+            'currency_code': list(first_new_days),
+            'conversion_day': np.array(list(first_new_days.values()), dtype=np.int32)
+        })
+        with timer.stage('rate_sums'):
+            refresh_rate_sums(new_days, os.path.join(DIR, 'refresh_rate_sums.sql'), eng)
+        with timer.stage('rollups'):
+            refresh_rate_rollups(new_days, os.path.join(DIR, 'refresh_rate_rollups.sql'), eng)
+        # publish the snapshot before the dashboard is told to reload
+        if inserted or (SNAPSHOT_DIR and not has_snapshot()):
+            with timer.stage('snapshot'):
+                publish_snapshot(eng)
+        if inserted:
+            notify_data_version()
+            notify_dashboard()
+        save_fetch_state(downloaded)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        loaders.shutdown(wait=True)
+        if pool is not None:
+            pool.closeall()
+        timer.report()
+
+def main():
+    run_pipeline()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
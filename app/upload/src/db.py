@@ -0,0 +1,124 @@
+import os
+import psycopg2
+import time
+from psycopg2.extras import RealDictCursor
+
+# days without a new rate after which a currency counts as no longer published
+STALE_DAYS = 30
+
+# oldest latest date among the currencies still published, which decides the
+# ECB file to download: a currency whose rows failed to load on the last run
+# lags the others, and its gap must be in the file
+LATEST_DATE_QUERY = '''
+WITH latest AS (
+    SELECT (SELECT MAX(r.conversion_date) FROM rates r WHERE r.currency_id = c.currency_id) AS latest_date
+    FROM currencies c
+)
+SELECT MIN(latest_date)
+FROM latest
+WHERE latest_date >= (SELECT MAX(latest_date) FROM latest) - %(stale_days)s;
+'''
+
+# periods of the rollups kept in rate_rollups (PostgreSQL date_trunc units)
+ROLLUP_RESOLUTIONS = os.getenv('ROLLUP_RESOLUTIONS', 'week,month').split(',')
+
+# incremental refreshes of the running sums and rollups
+REFRESH_FILES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('refresh_rate_sums.sql', 'refresh_rate_rollups.sql')
+]
+
+# channel the dashboard LISTENs on for new data versions
+RATES_NOTIFY_CHANNEL = os.getenv('RATES_NOTIFY_CHANNEL', 'rates_updated')
+
+# the data version as the dashboard computes it: '<latest date>:<row count>'
+NOTIFY_QUERY = '''
+SELECT pg_notify(%(channel)s, v.version), v.version
+FROM (SELECT MAX(conversion_date)::text || ':' || COUNT(*) AS version FROM conversion_rates) v;
+'''
+
+def get_db_params():
+    '''Connection parameters from the environment'''
+    return {
+        'host': os.getenv('POSTGRES_HOST', 'postgres'),
+        'port': os.getenv('POSTGRES_PORT', '5432'),
+        'database': os.getenv('POSTGRES_DB', 'currency_tracker'),
+        'user': os.getenv('POSTGRES_USER', 'postgres'),
+        'password': os.getenv('POSTGRES_PASSWORD', 'password')
+    }
+
+def get_db_connection():
+    '''Create database connection'''
+    return psycopg2.connect(**get_db_params())
+
+def test_connection():
+    '''Test PostgreSQL connection'''
+    error = None
+    for _ in range(10):
+        try:
+            conn = get_db_connection()
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute('SELECT version();')
+                version = cur.fetchone()
+                print(f'Connected to PostgreSQL: {version['version']}')
+                
+                # Test table access
+                cur.execute('SELECT COUNT(*) FROM conversion_rates;')
+                count = cur.fetchone()
+                print(f'Found {count['count']} records in conversion_rates table')
+                
+            conn.close()
+            return True
+        except psycopg2.OperationalError as e:
+            error = e
+            print("Database not ready, retrying...")
+            time.sleep(3)
+    print(f'Database connection failed: {error}')
+    return False
+
+def notify_data_version():
+    '''NOTIFY the dashboards listening on RATES_NOTIFY_CHANNEL of the new data version
+
+    The notification is delivered when the transaction commits.
+    '''
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(NOTIFY_QUERY, {'channel': RATES_NOTIFY_CHANNEL})
+            version = cur.fetchone()[1]
+        conn.commit()
+        print(f'Notified {RATES_NOTIFY_CHANNEL} of version {version}')
+    except psycopg2.Error as e:
+        print(f'Could not notify the dashboard: {e}')
+    finally:
+        conn.close()
+
+def get_latest_date():
+    '''Latest stored conversion date of the most lagging published currency, None if the database is empty'''
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(LATEST_DATE_QUERY, {'stale_days': STALE_DAYS})
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+def catch_up_aggregates():
+    '''Bring the running sums and rollups up to the stored rates
+
+    Runs the incremental refreshes without new dates, so every currency is
+    recomputed from its newest stored sum and period only: cheap when they
+    are current, and a repair of the rows a failed run committed without
+    refreshing them.
+    '''
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            for query_file in REFRESH_FILES:
+                with open(query_file, 'r') as f:
+                    cur.execute(f.read(), {'codes': [], 'from_dates': [], 'resolutions': ROLLUP_RESOLUTIONS})
+        conn.commit()
+    except psycopg2.Error as e:
+        print(f'Could not catch up the running sums and rollups: {e}')
+    finally:
+        conn.close()
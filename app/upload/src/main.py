@@ -0,0 +1,39 @@
+'''Entry point of the upload job
+
+Most nightly runs find nothing new, so the job first checks with light
+imports only (psycopg2 and requests): it asks the database for its latest
+date and makes the conditional download of the ECB file that date needs.
+Only when there is something to load are pandas, NumPy, pyarrow and
+SQLAlchemy imported, with the pipeline in app.py, which gets the file
+already downloaded.
+'''
+import os
+import time
+
+START = time.perf_counter()
+
+from dotenv import load_dotenv
+
+from db import catch_up_aggregates, get_latest_date, test_connection
+from scraper import download_csv
+from snapshot import SNAPSHOT_DIR, has_snapshot
+
+def main():
+    load_dotenv()
+    prefetched = None
+    # a backfill compares the full history, see app.BACKFILL
+    if os.getenv('UPLOAD_BACKFILL', 'false').lower() != 'true':
+        test_connection()
+        prefetched = download_csv(get_latest_date())
+        if prefetched['status'] == 'not_modified' and (not SNAPSHOT_DIR or has_snapshot()):
+            print('No new rates published since the last run')
+            catch_up_aggregates()
+            print(f'Done in {time.perf_counter() - START:.2f}s without loading the pipeline')
+            return
+    start = time.perf_counter()
+    import app
+    print(f'Imported the pipeline in {time.perf_counter() - start:.2f}s')
+    app.run_pipeline(prefetched)
+
+if __name__ == '__main__':
+    main()
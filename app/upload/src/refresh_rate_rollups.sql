@@ -0,0 +1,50 @@
+-- Incrementally refresh the rollups in rate_rollups.
+-- Each currency and resolution is recomputed from the period holding its
+-- earliest new date, or from its newest stored period if that is earlier, or
+-- from the start of its history if it has no rollups yet; earlier periods are
+-- complete and kept. Currencies without new dates are recomputed from their
+-- newest stored period, which catches up rows committed by a run that failed
+-- before refreshing. Only the raw rows of the recomputed periods are read, so
+-- the cost follows the size of the update, however many rows the history holds.
+CREATE TEMP TABLE affected_periods ON COMMIT DROP AS
+SELECT
+    c.currency_id,
+    res.resolution,
+    -- LEAST ignores the NULL from_date of currencies without new dates
+    date_trunc(res.resolution, LEAST(a.from_date, COALESCE(
+        (SELECT MAX(r.period_start)
+         FROM rate_rollups r
+         WHERE r.resolution = res.resolution
+            AND r.currency_id = c.currency_id),
+        '-infinity'::date)))::date AS from_date
+FROM
+    currencies c
+    LEFT JOIN unnest(%(codes)s::varchar[], %(from_dates)s::date[]) AS a(currency_code, from_date)
+        USING (currency_code)
+    CROSS JOIN unnest(%(resolutions)s::varchar[]) AS res(resolution);
+
+DELETE FROM rate_rollups r
+USING affected_periods a
+WHERE r.resolution = a.resolution
+    AND r.currency_id = a.currency_id
+    AND r.period_start >= a.from_date;
+
+INSERT INTO rate_rollups (resolution, currency_id, period_start,
+                          open_rate, high_rate, low_rate, close_rate, rate_sum, rate_count)
+SELECT
+    a.resolution,
+    a.currency_id,
+    date_trunc(a.resolution, r.conversion_date)::date,
+    (array_agg(r.conversion_rate ORDER BY r.conversion_date))[1],
+    MAX(r.conversion_rate),
+    MIN(r.conversion_rate),
+    (array_agg(r.conversion_rate ORDER BY r.conversion_date DESC))[1],
+    SUM(r.conversion_rate),
+    COUNT(*)
+FROM
+    affected_periods a
+    JOIN rates r
+        ON r.currency_id = a.currency_id
+        AND r.conversion_date >= a.from_date
+WHERE r.conversion_rate IS NOT NULL
+GROUP BY 1, 2, 3;
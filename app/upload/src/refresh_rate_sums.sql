@@ -0,0 +1,44 @@
+-- Incrementally refresh the running sums in conversion_rate_sums.
+-- Each currency is recomputed from its earliest new date, or from the day
+-- after its last running total if that is earlier (rows committed by a run
+-- that failed before refreshing), or from the start of its history if it has
+-- no sums yet, continuing from the last running total before that date.
+CREATE TEMP TABLE affected_sums ON COMMIT DROP AS
+SELECT
+    c.currency_id,
+    -- LEAST ignores the NULL from_date of currencies without new dates
+    LEAST(a.from_date, COALESCE(
+        (SELECT MAX(s.conversion_date) + 1
+         FROM conversion_rate_sums s
+         WHERE s.currency_id = c.currency_id),
+        '-infinity'::date)) AS from_date
+FROM
+    currencies c
+    LEFT JOIN unnest(%(codes)s::varchar[], %(from_dates)s::date[]) AS a(currency_code, from_date)
+        USING (currency_code);
+
+DELETE FROM conversion_rate_sums s
+USING affected_sums a
+WHERE s.currency_id = a.currency_id
+    AND s.conversion_date >= a.from_date;
+
+INSERT INTO conversion_rate_sums (currency_id, conversion_date, rate_sum, rate_count)
+SELECT
+    r.currency_id,
+    r.conversion_date,
+    COALESCE(b.rate_sum, 0) + SUM(r.conversion_rate) OVER w,
+    COALESCE(b.rate_count, 0) + COUNT(*) OVER w
+FROM
+    affected_sums a
+    JOIN rates r
+        ON r.currency_id = a.currency_id
+        AND r.conversion_date >= a.from_date
+    LEFT JOIN LATERAL (
+        SELECT s.rate_sum, s.rate_count
+        FROM conversion_rate_sums s
+        WHERE s.currency_id = a.currency_id
+            AND s.conversion_date < a.from_date
+        ORDER BY s.conversion_date DESC
+        LIMIT 1
+    ) b ON TRUE
+WINDOW w AS (PARTITION BY r.currency_id ORDER BY r.conversion_date);
@@ -1,18 +1,36 @@
+import hashlib
 import io
+import json
 import os
 import requests
 import zipfile
-from bs4 import BeautifulSoup
-from datetime import datetime
+from datetime import date, datetime
 
 # get directory of this file
 DIR = os.path.dirname(os.path.abspath(__file__))
 OUTFILE = 'eurofxref-hist.csv'
 OUTDIR = os.path.join(DIR, 'data')
+# validators (ETag, Last-Modified, content hash) of the last loaded download
+FETCH_STATE_FILE = 'fetch_state.json'
 
-def get_csv_zip_url():
+# overridable so a local HTTP server can stand in for the ECB
+ECB_BASE_URL = os.getenv('ECB_BASE_URL', 'https://www.ecb.europa.eu')
+# ECB files from smallest to largest, with how many days the database may be
+# behind for the file to cover the gap (90-day file minus slack for holidays)
+ECB_FILES = [
+    ('/stats/eurofxref/eurofxref.zip', 1),
+    ('/stats/eurofxref/eurofxref-hist-90d.zip', 85),
+    ('/stats/eurofxref/eurofxref-hist.zip', None),
+]
+
+def log(level, message):
+    print(f'{level}: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}: {message}')
+
+def get_csv_zip_url(base_url=ECB_BASE_URL):
+    # only the fallback to the ECB page needs an HTML parser
+    from bs4 import BeautifulSoup
     # ECB reference rates page
-    url = 'https://www.ecb.europa.eu/stats/policy_and_exchange_rates/euro_reference_exchange_rates/html/index.en.html'
+    url = base_url + '/stats/policy_and_exchange_rates/euro_reference_exchange_rates/html/index.en.html'
     resp = requests.get(url)
     resp.raise_for_status()
     soup = BeautifulSoup(resp.text, 'html.parser')
@@ -22,12 +40,12 @@ def get_csv_zip_url():
     for a in links:
         if 'eurofxref-hist.zip' in a['href']:
             href = a['href']
-            print(f'INFO: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}: Found CSV zip link: {href}')
+            log('INFO', f'Found CSV zip link: {href}')
             # ECB links are often relative
             if href.startswith('http'):
                 href = href
             else:
-                href = 'https://www.ecb.europa.eu' + href
+                href = base_url + href
             # take the first link that meets criteria
             break
     if href is None:
@@ -35,25 +53,114 @@ def get_csv_zip_url():
     else:
         return href
 
-def download_csv():
+def choose_file(latest_date, today=None):
+    '''Pick the smallest ECB file that covers everything after latest_date'''
+    if latest_date is None:
+        return ECB_FILES[-1][0]
+    days_behind = ((today or date.today()) - latest_date).days
+    for path, max_days_behind in ECB_FILES:
+        if max_days_behind is not None and days_behind <= max_days_behind:
+            return path
+    return ECB_FILES[-1][0]
+
+def load_fetch_state(outdir=OUTDIR):
+    try:
+        with open(os.path.join(outdir, FETCH_STATE_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_fetch_state(result, outdir=OUTDIR):
+    '''Remember the validators of a download once its rows are loaded
+
+    Saved only after a successful load, so a failed run is retried in full.
+    '''
+    if result.get('status') != 'success':
+        return
+    state = load_fetch_state(outdir)
+    state[result['url']] = result['validators']
+    with open(os.path.join(outdir, FETCH_STATE_FILE), 'w') as f:
+        json.dump(state, f, indent=2)
+
+def fetch(url, validators):
+    '''Conditionally GET a url
+
+    Returns (content, validators); content is None when the server answered
+    304 or the body hashes to the same content as the last load.
+    '''
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    resp = requests.get(url, headers=headers, timeout=60)
+    if resp.status_code == 304:
+        return None, validators
+    resp.raise_for_status()
+    new_validators = {
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+        'sha256': hashlib.sha256(resp.content).hexdigest()
+    }
+    if new_validators['sha256'] == validators.get('sha256'):
+        return None, new_validators
+    return resp.content, new_validators
+
+def normalize_daily_csv(csv_bytes):
+    '''Rewrite the daily file ("31 July 2025, 1.1446, ...") in the history file format'''
+    lines = csv_bytes.decode('utf-8').strip().splitlines()
+    rows = [[value.strip() for value in line.split(',')] for line in lines]
+    for row in rows[1:]:
+        row[0] = datetime.strptime(row[0], '%d %B %Y').strftime('%Y-%m-%d')
+    return ('\n'.join(','.join(row) for row in rows) + '\n').encode('utf-8')
+
+def download_csv(latest_date=None, base_url=ECB_BASE_URL, outdir=OUTDIR, path=None, conditional=None):
+    '''Download the smallest ECB file with everything newer than latest_date
+
+    path picks one of ECB_FILES instead, e.g. to start the download before
+    latest_date is known. The request is conditional on the last load's
+    validators unless conditional is False (by default: when latest_date is
+    given, so an empty database always gets the full download).
+
+    Returns a dict with the status ('success', 'not_modified' or 'error') and,
+    on success, the path of the written csv plus the validators to pass to
+    save_fetch_state once the rows are loaded.
+    '''
     # Create the output directory if it doesn't exist
-    if not os.path.exists(OUTDIR):
-        os.makedirs(OUTDIR)
-    # Find and download the zip file
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+    if conditional is None:
+        conditional = bool(latest_date)
     try:
-        zip_url = get_csv_zip_url()
-        resp = requests.get(zip_url)
-        resp.raise_for_status()
+        path = path or choose_file(latest_date)
+        zip_url = base_url + path
+        validators = load_fetch_state(outdir).get(zip_url, {}) if conditional else {}
+        try:
+            content, validators = fetch(zip_url, validators)
+        except requests.HTTPError:
+            if path != ECB_FILES[-1][0]:
+                raise
+            # fall back to the link published on the ECB page
+            zip_url = get_csv_zip_url(base_url)
+            content, validators = fetch(zip_url, {})
+        if content is None:
+            log('INFO', f'{zip_url} not modified since the last load')
+            return {'status': 'not_modified', 'url': zip_url, 'file': path}
         # Unzip the file in memory
-        with zipfile.ZipFile(io.BytesIO(resp.content)) as z:
+        with zipfile.ZipFile(io.BytesIO(content)) as z:
             for filename in z.namelist():
                 if filename.endswith('.csv'):
                     csv_bytes = z.read(filename)
+                    if path == ECB_FILES[0][0]:
+                        csv_bytes = normalize_daily_csv(csv_bytes)
                     # output the csv to a file
-                    with open(os.path.join(OUTDIR, OUTFILE), 'wb') as f:
+                    csv_path = os.path.join(outdir, filename)
+                    with open(csv_path, 'wb') as f:
                         f.write(csv_bytes)
-                    print(f'INFO: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}: Downloaded {filename} to {OUTDIR}')
-        return {'status': 'success'}
+                    log('INFO', f'Downloaded {filename} ({len(content)} bytes) to {outdir}')
+                    return {'status': 'success', 'url': zip_url, 'file': path,
+                            'path': csv_path, 'validators': validators}
+        raise Exception(f'No csv file found in {zip_url}')
     except Exception as e:
-        print(f'ERROR: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}: {str(e)}')
+        log('ERROR', str(e))
         return {'status': 'error', 'message': str(e)}
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+
+# numpy, pandas and pyarrow are imported where a snapshot is built, so the
+# job's entry point can check for a snapshot without loading them
+
+# directory shared with the dashboard; snapshots are disabled when unset
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', '')
+# pointer to the newest complete snapshot, replaced atomically
+LATEST_FILE = 'latest.json'
+# older snapshots kept so workers still mapping them are not surprised
+KEEP_SNAPSHOTS = 2
+
+SNAPSHOT_QUERY = '''
+SELECT currency_code, conversion_date,
+       CAST(conversion_rate AS DOUBLE PRECISION) AS conversion_rate
+FROM conversion_rates
+'''
+
+def build_snapshot(df):
+    '''Lay out the rate history as a currency-major Arrow table
+
+    Each currency is one block of len(dates) + 1 rows: a padding row followed
+    by one row per date, NaN where no rate was published. Alongside the rate,
+    running sums and counts (zero on the padding row) let readers answer
+    window averages without a pass over the data. Codes, dates (days since
+    1970-01-01) and the data version go into the schema metadata.
+    '''
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    codes, code_idx = np.unique(df['currency_code'].astype(str).to_numpy(), return_inverse=True)
+    days = pd.to_datetime(df['conversion_date']).values.astype('datetime64[D]').astype(np.int32)
+    dates, date_idx = np.unique(days, return_inverse=True)
+    rate = np.full((len(codes), len(dates) + 1), np.nan)
+    rate[code_idx, date_idx + 1] = df['conversion_rate'].to_numpy(dtype=np.float64)
+    version = f'{dates[-1].astype("datetime64[D]")}:{len(df)}' if len(dates) else None
+    metadata = {
+        'version': json.dumps(version),
+        'codes': json.dumps(codes.tolist()),
+        'dates': json.dumps(dates.tolist())
+    }
+    return pa.table({
+        'rate': rate.ravel(),
+        'cum_sum': np.nancumsum(rate, axis=1).ravel(),
+        'cum_count': np.cumsum(~np.isnan(rate), axis=1, dtype=np.int64).ravel()
+    }).replace_schema_metadata(metadata), version
+
+def has_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    '''Check whether a snapshot was published to snapshot_dir'''
+    return os.path.exists(os.path.join(snapshot_dir, LATEST_FILE))
+
+def publish_snapshot(eng, snapshot_dir=SNAPSHOT_DIR):
+    '''Write a versioned snapshot of conversion_rates for the dashboard
+
+    The file is written uncompressed so the dashboard can memory-map it, then
+    latest.json is switched to it atomically. Returns the snapshot path, or
+    None when snapshots are disabled or publishing failed; the dashboard then
+    keeps reading from the database.
+    '''
+    if not snapshot_dir:
+        return None
+    import pandas as pd
+    import pyarrow as pa
+    start = time.perf_counter()
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        table, version = build_snapshot(pd.read_sql(SNAPSHOT_QUERY, eng))
+        if version is None:
+            return None
+        filename = f'rates-{version.replace(":", "-")}.arrow'
+        path = os.path.join(snapshot_dir, filename)
+        with pa.OSFile(path + '.tmp', 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(path + '.tmp', path)
+        with open(os.path.join(snapshot_dir, LATEST_FILE + '.tmp'), 'w') as f:
+            json.dump({'file': filename, 'version': version}, f)
+        os.replace(os.path.join(snapshot_dir, LATEST_FILE + '.tmp'),
+                   os.path.join(snapshot_dir, LATEST_FILE))
+        remove_old_snapshots(snapshot_dir, filename)
+        print(f'Published snapshot {filename} ({os.path.getsize(path) / 1e6:.1f} MB) in '
+              f'{time.perf_counter() - start:.2f}s')
+        return path
+    except Exception as e:
+        print(f'Could not publish snapshot: {e}')
+        return None
+
+def remove_old_snapshots(snapshot_dir, current, keep=KEEP_SNAPSHOTS):
+    '''Delete all but the newest snapshots; mapped files stay readable until unmapped'''
+    snapshots = sorted(
+        (f for f in os.listdir(snapshot_dir) if f.startswith('rates-') and f.endswith('.arrow')),
+        key=lambda f: os.path.getmtime(os.path.join(snapshot_dir, f)), reverse=True)
+    for filename in snapshots[keep:]:
+        if filename != current:
+            os.remove(os.path.join(snapshot_dir, filename))
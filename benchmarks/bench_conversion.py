@@ -0,0 +1,57 @@
+"""Batch as-of conversion benchmarks over synthetic transactions"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from bench_dashboard import matrix_from_csv
+from common import add_dashboard_path, measure
+
+add_dashboard_path()
+from processing.conversion import AsOfConverter, convert_file  # noqa: E402
+
+TRANSACTION_COUNTS = [1_000_000, 10_000_000]
+FILE_ROWS = 1_000_000
+
+
+def transactions(matrix, n, seed=0):
+    """n random (date, currency, amount) rows over the matrix's dates and currencies
+
+    Dates are calendar days, weekends and holidays included, so most need
+    the as-of lookup.
+    """
+    rng = np.random.default_rng(seed)
+    codes = np.array(matrix.codes + [matrix.base])
+    span = int((matrix.dates[-1] - matrix.dates[0]) / np.timedelta64(1, 'D'))
+    dates = matrix.dates[0] + rng.integers(0, span + 1, n).astype('timedelta64[D]')
+    return dates, codes[rng.integers(0, len(codes), n)], rng.random(n) * 1000
+
+
+def run(csv_file, labels, repeat=5):
+    """Time converting in-memory batches and streaming a CSV file"""
+    results = []
+    matrix = matrix_from_csv(csv_file)
+    results.append(measure('AsOfConverter (build)', lambda: AsOfConverter(matrix), repeat, **labels))
+    converter = AsOfConverter(matrix)
+    for n in TRANSACTION_COUNTS:
+        dates, currencies, amounts = transactions(matrix, n)
+        results.append(measure(
+            'convert (str codes)', lambda: converter.convert(dates, currencies, amounts), repeat,
+            rows=n, **labels))
+        encoded = pa.array(currencies).dictionary_encode()
+        results.append(measure(
+            'convert (dictionary codes)', lambda: converter.convert(dates, encoded, amounts), repeat,
+            rows=n, **labels))
+
+    tmpdir = tempfile.mkdtemp(prefix='currency-bench-')
+    input_path = os.path.join(tmpdir, 'transactions.csv')
+    output_path = os.path.join(tmpdir, 'converted.csv')
+    dates, currencies, amounts = transactions(matrix, FILE_ROWS)
+    pd.DataFrame({'date': dates, 'currency': currencies, 'amount': amounts.round(2)}).to_csv(
+        input_path, index=False)
+    results.append(measure(
+        'convert_file (csv)', lambda: convert_file(converter, input_path, output_path), repeat,
+        rows=FILE_ROWS, **labels))
+    return results
@@ -0,0 +1,150 @@
+"""Dashboard callback benchmarks, driven through Dash's HTTP callback endpoint"""
+from datetime import date
+
+import dash
+import numpy as np
+from dash import html
+
+from common import add_dashboard_path, load_upload_app, measure
+
+add_dashboard_path()
+from api.rates import create_rates_blueprint  # noqa: E402
+from callbacks.chart_callbacks import register_chart_callbacks  # noqa: E402
+from callbacks.output_cache import MemoryBackend, OutputCache  # noqa: E402
+from config.settings import Config  # noqa: E402
+from database.rate_cache import RateCache, RateMatrix  # noqa: E402
+from monitoring.compression import enable_compression  # noqa: E402
+from monitoring.metrics import instrument_callbacks  # noqa: E402
+
+CURRENCY_SETS = [['USD'], ['USD', 'GBP', 'JPY'], ['USD', 'GBP', 'JPY', 'CHF', 'AUD', 'CAD', 'CNY', 'SEK', 'NOK', 'PLN']]
+
+
+def build_app(rate_cache=None, engine=None, output_cache=None, compress=False):
+    """Dash app with the chart callbacks registered, as create_app does
+
+    Outputs are not memoized unless an output cache is given, so every
+    request measures the callback's work.
+    """
+    app = dash.Dash(__name__, suppress_callback_exceptions=True)
+    app.layout = html.Div()
+    register_chart_callbacks(app, engine, rate_cache,
+                             output_cache=output_cache or OutputCache(rate_cache))
+    instrument_callbacks(app)
+    app.server.register_blueprint(create_rates_blueprint(rate_cache, engine))
+    if compress:
+        enable_compression(app.server)
+    return app
+
+
+def matrix_from_csv(csv_file):
+    """Rate matrix built from a history file instead of the database
+
+    Dates are shifted so the newest one is today, as date ranges are
+    relative to the current date.
+    """
+    upload = load_upload_app()
+    rates = upload.get_latest_rates(csv_file)
+    today = np.datetime64(date.today(), 'D').astype(np.int32)
+    rates['conversion_day'] += today - rates['conversion_day'].max()
+    return RateMatrix.from_frame(upload.to_db_rows(rates))
+
+
+def post_callback(client, output, outputs, inputs, encoding=None):
+    """POST a callback request the way the browser does"""
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    resp = client.post('/_dash-update-component', headers=headers, json={
+        'output': output,
+        'outputs': outputs,
+        'inputs': inputs,
+        'changedPropIds': [f"{inputs[0]['id']}.{inputs[0]['property']}"],
+        'state': []
+    })
+    assert resp.status_code == 200, resp.data[:200]
+    return resp.data
+
+
+def update_chart(client, currencies, days, base='EUR', encoding=None):
+    return post_callback(
+        client, 'chart.figure', {'id': 'chart', 'property': 'figure'},
+        [{'id': 'currency-dropdown', 'property': 'value', 'value': currencies},
+         {'id': 'date-range-filter', 'property': 'data', 'value': days},
+         {'id': 'base-dropdown', 'property': 'value', 'value': base}], encoding)
+
+
+def update_scorecards(client, currencies, base='EUR'):
+    return post_callback(
+        client, 'scorecards-container.children',
+        {'id': 'scorecards-container', 'property': 'children'},
+        [{'id': 'currency-dropdown', 'property': 'value', 'value': currencies},
+         {'id': 'base-dropdown', 'property': 'value', 'value': base}])
+
+
+def run(csv_file, labels, repeat=20, engine=None):
+    """Benchmark both callbacks, from the rate cache and (with engine) from SQL"""
+    results = []
+    cache = RateCache()
+    cache._matrix = matrix_from_csv(csv_file)
+    sources = [('cache', build_app(rate_cache=cache))]
+    if engine is not None:
+        sources.append(('sql', build_app(engine=engine)))
+
+    for source, app in sources:
+        client = app.server.test_client()
+        for currencies in CURRENCY_SETS:
+            for days, label in Config.DATE_RANGE_OPTIONS:
+                result = measure(
+                    f'update_chart ({source})',
+                    lambda: update_chart(client, currencies, days), repeat,
+                    currencies=len(currencies), range=label.replace(' ', '_'), **labels)
+                result['payload_bytes'] = len(update_chart(client, currencies, days))
+                results.append(result)
+            result = measure(
+                f'update_scorecards ({source})',
+                lambda: update_scorecards(client, currencies), repeat,
+                currencies=len(currencies), **labels)
+            result['payload_bytes'] = len(update_scorecards(client, currencies))
+            results.append(result)
+
+    # cross rates: every pair at once, and the callbacks from a non-EUR base
+    matrix = cache._matrix
+    codes = ['EUR'] + matrix.codes
+    results.append(measure(
+        'cross_rates (all pairs)', lambda: matrix.cross_rates(codes, codes), repeat,
+        rows=len(matrix.dates) * len(codes) ** 2, currencies=len(codes), **labels))
+    results.append(measure(
+        'rebase', lambda: matrix.rebase('USD'), repeat, currencies=len(codes), **labels))
+    client = sources[0][1].server.test_client()
+    for currencies in CURRENCY_SETS:
+        currencies = ['EUR' if code == 'USD' else code for code in currencies]
+        results.append(measure(
+            'update_chart (cache, from USD)',
+            lambda: update_chart(client, currencies, 365 * 100, 'USD'), repeat,
+            currencies=len(currencies), range='All_Time', **labels))
+        results.append(measure(
+            'update_scorecards (cache, from USD)',
+            lambda: update_scorecards(client, currencies, 'USD'), repeat,
+            currencies=len(currencies), **labels))
+
+    # memoized outputs (hits after the first request) and compressed payloads
+    memoized = build_app(rate_cache=cache, output_cache=OutputCache(cache, MemoryBackend(256)), compress=True)
+    client = memoized.server.test_client()
+    for currencies in CURRENCY_SETS:
+        for encoding in (None, 'gzip', 'br'):
+            result = measure(
+                'update_chart (cache, memoized)',
+                lambda: update_chart(client, currencies, 365 * 100, encoding=encoding), repeat,
+                currencies=len(currencies), range='All_Time', encoding=encoding or 'identity', **labels)
+            result['payload_bytes'] = len(update_chart(client, currencies, 365 * 100, encoding=encoding))
+            results.append(result)
+
+    # rates API: the full history of every currency, and a revalidated repeat
+    for fmt in ('json', 'ndjson', 'arrow'):
+        result = measure(
+            f'rates api ({fmt})', lambda: client.get(f'/rates?format={fmt}').data, repeat,
+            rows=int((~np.isnan(matrix.values)).sum()), **labels)
+        result['payload_bytes'] = len(client.get(f'/rates?format={fmt}').data)
+        results.append(result)
+    etag = client.get('/rates').headers['ETag']
+    results.append(measure(
+        'rates api (304)', lambda: client.get('/rates', headers={'If-None-Match': etag}), repeat, **labels))
+    return results
@@ -0,0 +1,94 @@
+"""Time to first byte of the dashboard after its process starts
+
+Starts the dashboard under gunicorn, as the container does, once per
+FAST_STARTUP setting. It polls until /healthz answers, / answers and
+/readyz reports ready, and records the seconds from process start to each
+of those points. The database settings (POSTGRES_HOST, ...) come from the
+environment. Point them at an unreachable host to see the start while the
+database is still down: /readyz then never turns ready within --timeout.
+
+Example:
+    python benchmarks/bench_startup.py --repeat 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+from common import DASHBOARD_DIR, ROOT, git_commit
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def status(url):
+    """HTTP status of a GET, None while nothing answers"""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return None
+
+
+def start_once(fast_startup, port, timeout):
+    """Seconds from process start until each endpoint first answers"""
+    env = dict(os.environ, FAST_STARTUP='true' if fast_startup else 'false', WEB_WORKERS='1')
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+         '--access-logfile', '/dev/null', 'wsgi:server'],
+        cwd=DASHBOARD_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    checks = {'healthz_s': '/healthz', 'first_page_s': '/', 'ready_s': '/readyz'}
+    result = {name: None for name in checks}
+    try:
+        while time.perf_counter() - start < timeout and None in result.values():
+            for name, path in checks.items():
+                if result[name] is None and status(base + path) == 200:
+                    result[name] = time.perf_counter() - start
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return result
+
+
+def run(repeat, port, timeout):
+    results = []
+    for fast_startup in (False, True):
+        for i in range(repeat):
+            result = {'name': 'dashboard_startup', 'fast_startup': fast_startup,
+                      **start_once(fast_startup, port, timeout)}
+            print(' '.join(f'{k}={v:.2f}' if isinstance(v, float) else f'{k}={v}'
+                           for k, v in result.items()))
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--timeout', type=float, default=120,
+                        help='seconds to wait for each start')
+    parser.add_argument('--out', default=None, help='output JSON path')
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.port, args.timeout)
+    commit = git_commit()
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    out = args.out or os.path.join(RESULTS_DIR, f'startup-{timestamp}-{commit}.json')
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({'commit': commit, 'timestamp': timestamp, 'results': results}, f, indent=2)
+    print(f'Results saved to {out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""Chart figure build and serialization benchmarks, without the HTTP round trip"""
+import plotly.io as pio
+
+from bench_dashboard import CURRENCY_SETS, matrix_from_csv
+from common import add_dashboard_path, measure
+
+add_dashboard_path()
+from callbacks.chart_callbacks import build_chart_figure  # noqa: E402
+from config.settings import Config  # noqa: E402
+from processing.downsample import downsample_frame  # noqa: E402
+
+
+def run(csv_file, labels, repeat=20):
+    """Time building and JSON-encoding the 'All Time' chart, as Dash does
+
+    Dash serializes callback outputs with plotly's JSON encoder, so
+    serialize_figure times the same encoding the browser receives.
+    """
+    results = []
+    matrix = matrix_from_csv(csv_file)
+    all_time = max(days for days, _ in Config.DATE_RANGE_OPTIONS)
+    for currencies in CURRENCY_SETS:
+        df = matrix.to_long(currencies, matrix.dates[-1] - all_time)
+        df = downsample_frame(df, Config.CHART_WIDTH_PX * 2, Config.DOWNSAMPLE_METHOD)
+        fig = build_chart_figure(df)
+        results.append(measure(
+            'build_chart_figure', lambda: build_chart_figure(df), repeat,
+            currencies=len(currencies), **labels))
+        result = measure(
+            'serialize_figure', lambda: pio.to_json(fig, validate=False), repeat,
+            currencies=len(currencies), **labels)
+        result['payload_bytes'] = len(pio.to_json(fig, validate=False))
+        result['points'] = len(df)
+        results.append(result)
+    return results
@@ -0,0 +1,77 @@
+"""Upload pipeline benchmarks: parse, gap detection and database load"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from common import load_upload_app, measure
+
+SQLITE_SCHEMA = """
+CREATE TABLE conversion_rates (
+    conversion_date DATE,
+    currency_code VARCHAR(3),
+    conversion_rate DECIMAL(50, 4),
+    PRIMARY KEY (conversion_date, currency_code)
+)
+"""
+
+
+def last_update_behind(upload, rates, days_behind):
+    """Fake last_update_per_currency for a database days_behind the file"""
+    latest = rates.groupby('currency_code', observed=True)['conversion_day'].max()
+    newest = latest.max()
+    # currencies still published are behind; retired ones are fully loaded
+    latest_day = np.where(latest >= newest - upload.STALE_DAYS, latest - days_behind, latest)
+    return pd.DataFrame({
+        'currency_code': latest.index.astype(str),
+        'latest_date': upload.from_days(latest_day),
+        'latest_day': latest_day.astype(np.int32)
+    })
+
+
+def reset_database(engine):
+    with engine.begin() as connection:
+        if engine.dialect.name == 'postgresql':
+            connection.execute(text('TRUNCATE rates, currencies, conversion_rate_sums, rate_rollups'))
+        else:
+            connection.execute(text('DROP TABLE IF EXISTS conversion_rates'))
+            connection.execute(text(SQLITE_SCHEMA))
+
+
+def run(csv_file, db_url, labels, repeat=5):
+    upload = load_upload_app()
+    results = []
+    full = upload.get_latest_rates(csv_file)
+    nightly = last_update_behind(upload, full, days_behind=1)
+    existing = full.sample(frac=0.999, random_state=0)
+    existing_keys = pd.DataFrame({
+        'currency_code': existing['currency_code'].astype(str),
+        'conversion_day': existing['conversion_day']
+    })
+
+    results.append(measure(
+        'get_latest_rates (full)', lambda: upload.get_latest_rates(csv_file),
+        repeat, rows=len, **labels))
+    results.append(measure(
+        'get_latest_rates (nightly)', lambda: upload.get_latest_rates(csv_file, nightly),
+        repeat, rows=len, **labels))
+    nightly_rates = upload.get_latest_rates(csv_file, nightly)
+    results.append(measure(
+        'get_missing_dates (nightly)', lambda: upload.get_missing_dates(nightly, nightly_rates),
+        repeat, rows=len(nightly_rates), **labels))
+    results.append(measure(
+        'get_missing_dates (backfill)',
+        lambda: upload.get_missing_dates(nightly, full, existing_keys),
+        repeat, rows=len(full), **labels))
+
+    engine = create_engine(db_url)
+
+    def cold_load():
+        reset_database(engine)
+        upload.insert_missing_dates(full, engine)
+
+    # a cold start backfill is slow at large scales, so it runs fewer times
+    results.append(measure(
+        f'insert_missing_dates (cold, {engine.dialect.name})', cold_load,
+        max(1, repeat // 5), rows=len(full), **labels))
+    reset_database(engine)
+    return results
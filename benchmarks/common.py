@@ -0,0 +1,120 @@
+import importlib.util
+import itertools
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOAD_DIR = os.path.join(ROOT, 'app', 'upload', 'src')
+DASHBOARD_DIR = os.path.join(ROOT, 'app', 'dashboard')
+HISTORY_CSV = os.path.join(ROOT, 'analysis', 'eurofxref-hist.csv')
+
+
+def load_upload_app():
+    """Import app/upload/src/app.py as upload_app (the dashboard also has an app.py)"""
+    if 'upload_app' in sys.modules:
+        return sys.modules['upload_app']
+    sys.path.insert(0, UPLOAD_DIR)
+    spec = importlib.util.spec_from_file_location('upload_app', os.path.join(UPLOAD_DIR, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['upload_app'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def add_dashboard_path():
+    if DASHBOARD_DIR not in sys.path:
+        sys.path.insert(0, DASHBOARD_DIR)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+def measure(name, fn, repeat=5, rows=None, **labels):
+    """Time fn over repeat runs and trace its peak allocations in one more run
+
+    Returns a result dict with p50/p99/mean latency in ms, rows/sec when rows
+    is given (a number or a callable taking fn's return value) and the peak
+    traced allocation in MB.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak_alloc = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings = np.array(timings) * 1000
+    result = {
+        'name': name,
+        **labels,
+        'repeat': repeat,
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p99_ms': float(np.percentile(timings, 99)),
+        'mean_ms': float(timings.mean()),
+        'peak_alloc_mb': peak_alloc / 1e6,
+    }
+    if rows is not None:
+        n = rows(value) if callable(rows) else rows
+        result['rows'] = int(n)
+        result['rows_per_sec'] = n / (result['p50_ms'] / 1000) if result['p50_ms'] else None
+    print(f"{name:<40} {' '.join(f'{k}={v}' for k, v in labels.items()):<28} "
+          f"p50 {result['p50_ms']:9.1f} ms  p99 {result['p99_ms']:9.1f} ms"
+          + (f"  {result['rows_per_sec']:,.0f} rows/s" if result.get('rows_per_sec') else ''))
+    return result
+
+
+def synthetic_codes(n, reserved=()):
+    """n three-letter currency codes that do not clash with real ones"""
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    codes = (''.join(c) for c in itertools.product(letters, repeat=3))
+    return list(itertools.islice((c for c in codes if c not in reserved), n))
+
+
+def write_scaled_history(path, date_scale=1, currency_scale=1, seed=0):
+    """Write a synthetic ECB-style history file scaled in dates and currencies
+
+    The real file is extended backwards with extra business days and sideways
+    with extra currencies, each a random walk, in the ECB wide layout (newest
+    date first, 'N/A' for missing values, trailing comma).
+    """
+    real = pd.read_csv(HISTORY_CSV, na_values=['N/A'])
+    real = real.loc[:, [c for c in real.columns if not c.startswith('Unnamed')]]
+    currencies = [c for c in real.columns if c != 'Date']
+    n_dates = len(real) * date_scale
+    n_currencies = len(currencies) * currency_scale
+
+    dates = pd.bdate_range(end=real['Date'].iloc[0], periods=n_dates)[::-1]
+    codes = currencies + synthetic_codes(n_currencies - len(currencies), set(currencies))
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 0.005, size=(n_dates, n_currencies))
+    values = np.exp(np.cumsum(steps[::-1], axis=0)[::-1]) * rng.uniform(0.5, 200, n_currencies)
+    # keep the real history where it exists
+    values[:len(real), :len(currencies)] = real[currencies].to_numpy()
+
+    wide = pd.DataFrame(values.round(4), columns=codes)
+    wide.insert(0, 'Date', dates.strftime('%Y-%m-%d'))
+    wide[''] = np.nan
+    wide.to_csv(path, index=False, na_rep='N/A')
+    return path
@@ -0,0 +1,37 @@
+"""Compare two benchmark result files, e.g. from two commits
+
+    python benchmarks/compare.py results/old.json results/new.json
+"""
+import json
+import sys
+
+KEY_FIELDS = ('name', 'date_scale', 'currency_scale', 'currencies', 'range')
+
+
+def key(result):
+    return tuple(result.get(field) for field in KEY_FIELDS)
+
+
+def main(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    baseline = {key(r): r for r in old['results']}
+    print(f"{old['commit']} -> {new['commit']}")
+    print(f"{'benchmark':<70} {'old p50':>10} {'new p50':>10} {'speedup':>8}")
+    for result in new['results']:
+        before = baseline.get(key(result))
+        label = ' '.join(str(v) for v in key(result) if v is not None)
+        if before is None:
+            print(f"{label:<70} {'-':>10} {result['p50_ms']:>10.1f} {'new':>8}")
+            continue
+        speedup = before['p50_ms'] / result['p50_ms'] if result['p50_ms'] else float('inf')
+        print(f"{label:<70} {before['p50_ms']:>10.1f} {result['p50_ms']:>10.1f} {speedup:>7.2f}x")
+    print(f"peak RSS {old['peak_rss_mb']:.0f} MB -> {new['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    main(sys.argv[1], sys.argv[2])